@@ -0,0 +1,59 @@
+"""collect._clean microbenchmark: the single anchored matcher against the
+previous chain of regexes and prefix checks, over short prompts, pasted
+logs of a few hundred KB, and scaffolding that gets dropped.
+
+Run: python3 bench/bench_clean.py [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import timeit
+
+import synth  # sets up sys.path for the scripts
+
+import collect  # noqa: E402
+
+_NOISE = re.compile(r"^(<teammate-message|<bash-(input|stdout|stderr)|task-notification)", re.I)
+_COMMAND_NAME = re.compile(r"^<command-name>[^<]+</command-name>")
+
+
+def legacy_clean(text):
+    t = text.strip()
+    if not t or _NOISE.search(t) or _COMMAND_NAME.search(t):
+        return None
+    if t.startswith("<command-message>") or t.startswith("<command-args>"):
+        return None
+    t = collect._SYSTEM_REMINDER.sub("", t).strip()
+    if not t or t.startswith(collect._DROP_PREFIXES):
+        return None
+    return t
+
+
+def corpus():
+    rng = random.Random(0)
+    short = synth.prompts(2000)
+    pasted = [p + "\n" + "\n".join(f"2026-08-09 12:00:{i % 60:02d} INFO worker {i} ok"
+                                   for i in range(rng.randint(2000, 8000)))
+              for p in synth.prompts(40, seed=1)]
+    dropped = ["<bash-stdout>" + "x" * 50_000, "<command-name>/clear</command-name>",
+               "[Request interrupted by user]", "<teammate-message>hi</teammate-message>"] * 50
+    reminded = [f"<system-reminder>ctx</system-reminder>{p}" for p in synth.prompts(200, seed=2)]
+    return {"short": short, "pasted": pasted, "dropped": dropped, "with reminder": reminded}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+    for label, texts in corpus().items():
+        assert [collect._clean(t) for t in texts] == [legacy_clean(t) for t in texts]
+        old = min(timeit.repeat(lambda: [legacy_clean(t) for t in texts], number=1, repeat=args.repeat))
+        new = min(timeit.repeat(lambda: [collect._clean(t) for t in texts], number=1, repeat=args.repeat))
+        print(f"{label:<14} {len(texts):5} texts  legacy {old * 1e3:8.2f} ms  "
+              f"compiled {new * 1e3:8.2f} ms  {old / new:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""greedy_cluster over synthetic embeddings: the previous per-pair cosine
+against pre-normalized float32 vectors with a dot-product kernel (and the
+NumPy path when it is importable), and the LSH seed index against exact
+search, with its pair recall and precision. The legacy loop is O(n·k·d) in
+the interpreter, so it only runs up to --legacy-max prompts.
+
+Run: python3 bench/bench_cluster.py [--n 10000 100000] [--dim 768] [--themes 200]
+         [--tables 12] [--bits 8]
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from array import array
+from collections import Counter
+from unittest import mock
+
+import synth  # noqa: F401  (sets up sys.path for the scripts)
+
+import cluster  # noqa: E402
+
+
+def legacy_greedy(vectors, threshold=0.83):
+    def cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        na = math.sqrt(sum(x * x for x in a))
+        nb = math.sqrt(sum(y * y for y in b))
+        return 0.0 if na == 0 or nb == 0 else dot / (na * nb)
+    clusters = []
+    for i, v in enumerate(vectors):
+        for c in clusters:
+            if cosine(v, c["seed"]) >= threshold:
+                c["members"].append(i)
+                break
+        else:
+            clusters.append({"members": [i], "seed": v})
+    return [{"members": c["members"], "representative": c["members"][0], "size": len(c["members"])}
+            for c in clusters]
+
+
+def vectors(n, dim, themes, seed=0, noise=0.3):
+    """Prompts drawn from `themes` directions plus noise, roughly as related
+    prompts sit in embedding space."""
+    rng = random.Random(seed)
+    centers = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(themes)]
+    return [array("f", [x + rng.gauss(0, noise) for x in rng.choice(centers)]) for _ in range(n)]
+
+
+def _pairs(counts):
+    return sum(k * (k - 1) // 2 for k in counts.values())
+
+
+def pair_scores(exact, approx):
+    """Of the prompt pairs exact greedy puts together, the share the
+    approximate run also does (recall), and the reverse (precision)."""
+    def label(clusters):
+        out = {}
+        for c, cl in enumerate(clusters):
+            for m in cl["members"]:
+                out[m] = c
+        return out
+    e, a = label(exact), label(approx)
+    both = _pairs(Counter((e[i], a[i]) for i in e))
+    return both / (_pairs(Counter(e.values())) or 1), both / (_pairs(Counter(a.values())) or 1)
+
+
+def _time(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--themes", type=int, default=200)
+    ap.add_argument("--legacy-max", type=int, default=10_000)
+    ap.add_argument("--tables", type=int, default=cluster.LSH_TABLES)
+    ap.add_argument("--bits", type=int, default=cluster.LSH_BITS)
+    args = ap.parse_args(argv)
+    for n in args.n:
+        vecs = vectors(n, args.dim, args.themes)
+        with mock.patch.object(cluster, "np", None):
+            dt, fast = _time(lambda: cluster.greedy_cluster(vecs, ann=False))
+        line = f"n={n:<7} clusters {len(fast):5}  array('f') {dt:8.2f}s"
+        if cluster.np is not None:
+            dn, vec = _time(lambda: cluster.greedy_cluster(vecs, ann=False))
+            line += f"  numpy {dn:7.2f}s ({'same' if vec == fast else 'DIFFERENT'})"
+        if n <= args.legacy_max:
+            dl, old = _time(lambda: legacy_greedy(vecs))
+            line += f"  legacy {dl:8.2f}s  {dl / dt:5.2f}x ({'same' if old == fast else 'DIFFERENT'})"
+        print(line, flush=True)
+        with mock.patch.object(cluster, "LSH_TABLES", args.tables), \
+             mock.patch.object(cluster, "LSH_BITS", args.bits):
+            for label, np_mod in (("lsh", None), ("lsh+numpy", cluster.np)):
+                if label == "lsh+numpy" and np_mod is None:
+                    continue
+                with mock.patch.object(cluster, "np", np_mod):
+                    da, approx = _time(lambda: cluster.greedy_cluster(vecs, ann=True))
+                recall, precision = pair_scores(fast, approx)
+                print(f"{'':9} {label:<10} {args.tables}x{args.bits} bits  {da:8.2f}s  "
+                      f"{dt / da:5.2f}x vs exact  clusters {len(approx):5}  "
+                      f"pair recall {recall:.3f}  precision {precision:.3f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""The local (no-embedding) clusterers on a synthetic corpus where each
+prompt's intent (verb + object) and topic (object) are known, phrased
+several ways: reordered, with "please", behind "can you". Pair
+precision/recall say how well each recovers them: MinHash targets
+near-duplicates (intents), TF-IDF topical similarity; the first-two-token
+signature splits reorderings and lumps every "can you ...".
+
+Run: python3 bench/bench_local_cluster.py [--n 100000]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections import Counter
+
+import synth  # sets up sys.path for the scripts
+
+import cluster  # noqa: E402
+
+_FORMS = ["{v} {o}", "please {v} {o}", "{v} {o} please", "can you {v} {o}",
+          "can you {v} {o} {t}", "{v} {o} {t}", "{t}, {v} {o}"]
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        v, o, t = rng.choice(synth._VERBS), rng.choice(synth._OBJECTS), rng.choice(synth._TAILS)
+        out.append((rng.choice(_FORMS).format(v=v, o=o, t=t), (v, o)))
+    return out
+
+
+def _pairs(counts):
+    return sum(k * (k - 1) // 2 for k in counts.values())
+
+
+def pair_scores(labels, clusters):
+    """Pairs sharing a label that land together (recall), and pairs
+    landing together that share a label (precision)."""
+    assigned = {m: c for c, cl in enumerate(clusters) for m in cl["members"]}
+    both = _pairs(Counter((labels[i], assigned[i]) for i in assigned))
+    return both / (_pairs(Counter(labels)) or 1), both / (_pairs(Counter(assigned.values())) or 1)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    args = ap.parse_args(argv)
+    rows = corpus(args.n)
+    texts, intents = [t for t, _ in rows], [label for _, label in rows]
+    topics = [o for _, o in intents]
+    print(f"{args.n:,} prompts, {len(set(intents))} intents, {len(set(topics))} topics")
+    for name, fn in (("token-signature", cluster.token_signature_cluster),
+                     ("minhash", cluster.minhash_cluster),
+                     ("tfidf", cluster.tfidf_cluster)):
+        t0 = time.perf_counter()
+        clusters = fn(texts)
+        dt = time.perf_counter() - t0
+        print(f"{name:<16} {dt:7.2f}s  clusters {len(clusters):6}  largest {max(c['size'] for c in clusters):6}",
+              flush=True)
+        for label, labels in (("intent", intents), ("topic", topics)):
+            recall, precision = pair_scores(labels, clusters)
+            print(f"{'':16}   by {label:<7} pair recall {recall:.3f}  precision {precision:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Embedding storage formats over synthetic embeddings: for float32, float16
+and int8, each with and without a random projection, the cache file size,
+the decoded working set, encode and greedy clustering time, and pair
+recall/precision of the clusters against full-precision float32.
+
+Run: python3 bench/bench_quantize.py [--n 5000] [--dim 768] [--themes 100] [--project 256]
+         [--noise 0.3]
+
+Noise near 0.42 puts many prompts close to the 0.83 threshold, where the
+projection's distortion shows. The synthetic centres are zero-mean, unlike
+real embeddings; tests/test_quantize.py checks projection on offset vectors.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import tracemalloc
+from unittest import mock
+
+import synth  # noqa: F401  (sets up sys.path for the scripts)
+
+import cluster  # noqa: E402
+import embed_cache  # noqa: E402
+import quantize  # noqa: E402
+from bench_cluster import _time, pair_scores, vectors  # noqa: E402
+
+
+def _working_set(codec, encoded):
+    tracemalloc.start()
+    decoded = [codec.decode(d) for d in encoded]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return decoded, size
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5_000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--themes", type=int, default=100)
+    ap.add_argument("--project", type=int, default=256)
+    ap.add_argument("--noise", type=float, default=0.3)
+    args = ap.parse_args(argv)
+    vecs = vectors(args.n, args.dim, args.themes, noise=args.noise)
+    texts = [str(i) for i in range(args.n)]
+    baseline = None
+    for fmt in quantize.FORMATS:
+        for dim in (None, args.project):
+            codec = quantize.Codec(fmt, dim)
+            de, encoded = _time(lambda: [codec.encode(v) for v in vecs])
+            with tempfile.TemporaryDirectory() as d:
+                cache = embed_cache.EmbeddingCache(d, max_bytes=2**40, codec=codec)
+                for t, v in zip(texts, vecs):
+                    cache.put("m", t, v)
+                cache.save()
+                disk = (cache.dir / cache.file).stat().st_size
+            decoded, mem = _working_set(codec, encoded)
+            with mock.patch.object(cluster, "np", None):
+                dc, clusters = _time(lambda: cluster.greedy_cluster(decoded, ann=False))
+            if baseline is None:
+                baseline, base_time = clusters, dc
+            recall, precision = pair_scores(baseline, clusters)
+            print(f"{codec.tag:<12} disk {disk / 2**20:7.2f} MiB  memory {mem / 2**20:7.2f} MiB  "
+                  f"encode {de:6.2f}s  cluster {dc:6.2f}s ({base_time / dc:4.2f}x)  "
+                  f"clusters {len(clusters):5}  pair recall {recall:.3f}  precision {precision:.3f}",
+                  flush=True)
+
+
+if __name__ == "__main__":
+    main()
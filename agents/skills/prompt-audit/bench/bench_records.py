@@ -0,0 +1,57 @@
+"""Per-prompt memory: the old dict records against slotted, interned Prompt
+records, each built from freshly decoded JSON as collection does.
+
+Run: python3 bench/bench_records.py [--n 200000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tracemalloc
+
+import synth  # sets up sys.path for the scripts
+
+import collect  # noqa: E402
+
+
+def _events(n, rng):
+    sessions = [f"{rng.getrandbits(128):032x}" for _ in range(max(1, n // 40))]
+    projects = [f"project-{i}" for i in range(30)]
+    for i in range(n):
+        yield json.dumps({"text": synth.prompt_text(rng), "project": rng.choice(projects),
+                          "session": rng.choice(sessions), "model": rng.choice(synth.MODELS),
+                          "timestamp": f"2026-08-{1 + i % 28:02d}T00:{i % 60:02d}:00.{i:06d}Z"})
+
+
+def _measure(lines, build):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    records = [build(json.loads(line)) for line in lines]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    texts = sum(len(r["text"]) + 49 for r in records)   # str header + ascii payload
+    return used, texts, records
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args(argv)
+    lines = list(_events(args.n, random.Random(0)))
+
+    rows = [("dict", lambda e: e),
+            ("Prompt", lambda e: collect.Prompt(e["text"], e["project"], e["session"],
+                                                e["timestamp"], e["model"]))]
+    results = {}
+    for label, build in rows:
+        used, texts, records = _measure(lines, build)
+        results[label] = used
+        print(f"{label:<7} {used / args.n:8.1f} B/prompt total  "
+              f"{(used - texts) / args.n:8.1f} B/prompt excluding text")
+        del records
+    print(f"saving: {1 - results['Prompt'] / results['dict']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Rule evaluation throughput: per-prompt apply_to_prompt, a compiled bundle's
+apply, and apply_batch over the same prompts and criteria (a banned-word list
+plus a couple of frontmatter regex checks).
+
+Run: python3 bench/bench_rules.py [--n 100000] [--banned 300]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import synth  # sets up sys.path for the scripts
+
+import rules  # noqa: E402
+
+
+class _File:
+    def __init__(self, meta):
+        self.meta = meta
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--banned", type=int, default=300)
+    args = ap.parse_args(argv)
+
+    texts = synth.prompts(args.n)
+    files = [_File({"banned_words": [f"term{i}" for i in range(args.banned)] + ["cache"],
+                    "max_words": 40, "regex_hedging": r"\b(maybe|perhaps)\b",
+                    "regex_polite": r"\bplease\b"})]
+    params, enabled = rules.merge_params(files)
+    bundle = rules.compile_bundle(files)
+
+    timings = {}
+    for label, run in [
+        ("apply_to_prompt", lambda: [rules.apply_to_prompt(t, params, enabled) for t in texts]),
+        ("bundle.apply", lambda: [bundle.apply(t) for t in texts]),
+        ("apply_batch", lambda: rules.apply_batch(texts, bundle)),
+    ]:
+        t0 = time.perf_counter()
+        out = run()
+        timings[label] = time.perf_counter() - t0
+        flagged = sum(1 for f in out if f)
+        print(f"{label:<16} {timings[label]:6.2f}s  {args.n / timings[label]:10,.0f} prompts/s  "
+              f"({flagged:,} flagged)")
+    assert rules.apply_batch(texts[:2000], bundle) == [bundle.apply(t) for t in texts[:2000]]
+    print(f"batch vs per-prompt: {timings['apply_to_prompt'] / timings['apply_batch']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Transcript scanning throughput: the full-decode reader against the mmap
+scanner with the user/assistant prefilter, over a synthetic corpus.
+
+Run: python3 bench/bench_scan.py [--mb 2048] [--dir PATH]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import synth  # sets up sys.path for the scripts
+
+import collect  # noqa: E402
+import common  # noqa: E402
+
+
+def _time(label, paths, total_bytes, total_lines, **kw):
+    t0 = time.perf_counter()
+    events = sum(1 for p in paths for _ in common.iter_file_events(p, **kw))
+    dt = time.perf_counter() - t0
+    print(f"{label:<18} {dt:7.2f}s  {total_lines / dt:12,.0f} lines/s  "
+          f"{total_bytes / dt / 2**20:8.1f} MB/s  ({events:,} events decoded)")
+    return dt
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=int, default=2048, help="corpus size in MB")
+    ap.add_argument("--dir", help="reuse or create the corpus here instead of a temp dir")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.dir or tmp)
+        if not any(root.rglob("*.jsonl")):
+            synth.write_corpus(root, args.mb)
+        paths = common.transcript_paths(root)
+        total_bytes = sum(p.stat().st_size for p in paths)
+        total_lines = sum(p.read_bytes().count(b"\n") for p in paths)
+        print(f"corpus: {len(paths):,} files, {total_lines:,} lines, {total_bytes / 2**20:,.0f} MB")
+        before = _time("full decode", paths, total_bytes, total_lines)
+        after = _time("mmap + prefilter", paths, total_bytes, total_lines,
+                      prefilter=collect._EVENT_TYPES)
+        print(f"speedup: {before / after:.2f}x")
+        same = all(collect.prompts_from_events(common.iter_file_events(p)) == collect.scan_file(p)
+                   for p in paths[:50])
+        print("collected prompts identical:", same)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Synthetic prompts and transcripts for the prompt-audit benchmarks. Seeded,
+so a benchmark sees the same corpus run to run. Stdlib only."""
+from __future__ import annotations
+
+import json
+import random
+import sys
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
+
+_VERBS = ["fix", "run", "add", "remove", "refactor", "explain", "review", "commit",
+          "rename", "document", "test", "debug", "profile", "revert", "update"]
+_OBJECTS = ["the build", "the tests", "the parser", "this function", "the config",
+            "the migration", "the docs", "the login flow", "the cache", "the CLI",
+            "the release notes", "the flaky test", "the API client", "the schema"]
+_TAILS = ["please", "and push", "before lunch", "without touching the UI",
+          "instead of the old approach", "like I said", "in the worker module",
+          "and keep it short", "then run the linter", "for the staging env"]
+_FILLER = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+           "tempor incididunt ut labore et dolore magna aliqua").split()
+MODELS = ["claude-opus-4-8", "claude-sonnet-4-6", "claude-haiku-4-5"]
+
+
+def prompt_text(rng: random.Random) -> str:
+    words = [rng.choice(_VERBS), rng.choice(_OBJECTS)]
+    if rng.random() < 0.6:
+        words.append(rng.choice(_TAILS))
+    if rng.random() < 0.2:
+        words.extend(rng.choices(_FILLER, k=rng.randint(5, 60)))
+    return " ".join(words)
+
+
+def prompts(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [prompt_text(rng) for _ in range(n)]
+
+
+def _blob(rng, size):
+    return " ".join(rng.choices(_FILLER, k=size // 6))
+
+
+def session_lines(rng: random.Random, session: str, turns: int) -> list[str]:
+    """One transcript in Claude Code's compact JSONL form. Bytes are dominated
+    by tool results, assistant output and progress events, as in real ones."""
+    out = []
+    model = rng.choice(MODELS)
+    for t in range(turns):
+        ts = f"2026-08-{1 + t % 28:02d}T{t % 24:02d}:00:00Z"
+        base = {"sessionId": session, "cwd": "/x/proj", "timestamp": ts}
+        out.append({**base, "type": "user",
+                    "message": {"role": "user", "content": prompt_text(rng)}})
+        for _ in range(rng.randint(2, 6)):
+            out.append({**base, "type": "progress", "data": {"log": _blob(rng, 800)}})
+            out.append({**base, "type": "assistant",
+                        "message": {"role": "assistant", "model": model,
+                                    "content": [{"type": "text", "text": _blob(rng, 1500)}]}})
+            out.append({**base, "type": "user",
+                        "message": {"role": "user", "content": [
+                            {"type": "tool_result", "content": _blob(rng, 3000)}]}})
+        out.append({**base, "type": "file-history-snapshot", "snapshot": _blob(rng, 2500)})
+    return [json.dumps(e, separators=(",", ":")) for e in out]
+
+
+def write_corpus(root: Path, megabytes: int, seed: int = 0, distinct: int = 64) -> int:
+    """Write transcripts under `root` until about `megabytes` MB; returns bytes.
+    Generating JSON dominates at multi-GB sizes, so `distinct` sessions are
+    generated once and cycled."""
+    rng = random.Random(seed)
+    pool = [("\n".join(session_lines(rng, f"s{n}", rng.randint(5, 40))) + "\n").encode()
+            for n in range(distinct)]
+    target, written, n = megabytes * 1024 * 1024, 0, 0
+    while written < target:
+        proj = root / f"proj{n % 16}"
+        proj.mkdir(parents=True, exist_ok=True)
+        data = pool[n % distinct]
+        (proj / f"s{n}.jsonl").write_bytes(data)
+        written += len(data)
+        n += 1
+    return written
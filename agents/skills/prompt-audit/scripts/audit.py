@@ -1,7 +1,11 @@
 """prompt-audit orchestrator: collect -> rules -> cluster -> judge -> report.
 Incremental via a watermark; fail-open at every stage. Stdlib only.
 
-Run: python3 audit.py [--since 7d|<ISO>] [--no-embed] [--cap N] [--dry-run]
+Run: python3 audit.py [--since 7d|<ISO>] [--no-embed] [--cluster-method M] [--cap N] [--dry-run] [--count]
+     [--workers N] [--embed-batch N] [--embed-concurrency N] [--recompact-themes]
+     [--embed-format f32|f16|i8] [--embed-dim N] [--judge-workers N] [--judge-deadline S]
+     [--judge-budget TOKENS] [--judge-stream]
+     [--threshold T] [--thresholds T1,T2,...]
 """
 from __future__ import annotations
 
@@ -16,12 +20,17 @@ sys.path.insert(0, str(HERE))
 import cluster as cluster_mod  # noqa: E402
 import collect  # noqa: E402
 import common  # noqa: E402
+import embed_cache  # noqa: E402
 import judge as judge_mod  # noqa: E402
+import quantize  # noqa: E402
 import report as report_mod  # noqa: E402
 import rubric  # noqa: E402
 import rules as rules_mod  # noqa: E402
+import seen  # noqa: E402
+import themes as themes_mod  # noqa: E402
 
 REFERENCES = HERE.parent / "references"
+RULE_BATCH = 2000
 
 
 def _since_from_arg(arg, watermark_last):
@@ -35,41 +44,185 @@ def _since_from_arg(arg, watermark_last):
     return arg
 
 
+def _thresholds(arg):
+    try:
+        return [float(t) for t in arg.split(",") if t.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a comma-separated list of numbers: {arg!r}") from None
+
+
+def _evaluate(todo, prompts, rule_findings):
+    """Run the rules over prompts the store had no findings for, batched per
+    bundle."""
+    for bundle, indices in todo.values():
+        for lo in range(0, len(indices), RULE_BATCH):
+            chunk = indices[lo:lo + RULE_BATCH]
+            for i, findings in zip(chunk, rules_mod.apply_batch([prompts[i]["text"] for i in chunk], bundle)):
+                if findings:
+                    rule_findings[i] = findings
+
+
+def _save_scan_state(cursors, index):
+    common.write_json(common.cursors_path(), cursors)
+    common.write_json(common.index_path(), index)
+
+
 def run(argv=None):
     ap = argparse.ArgumentParser(prog="prompt-audit")
     ap.add_argument("--since")
     ap.add_argument("--no-embed", action="store_true")
+    ap.add_argument("--cluster-method", choices=cluster_mod.METHODS, default="auto",
+                    help="embeddings (auto: with a MinHash fallback), tfidf or minhash")
+    ap.add_argument("--threshold", type=float, default=0.83,
+                    help="embedding similarity needed to join a cluster")
+    ap.add_argument("--thresholds", type=_thresholds, default=[],
+                    help="also report single-linkage clusterings at these thresholds, e.g. 0.75,0.8,0.9")
+    ap.add_argument("--embed-batch", type=int, default=cluster_mod.EMBED_BATCH,
+                    help="texts per ollama embedding request (1 disables batching)")
+    ap.add_argument("--embed-concurrency", type=int, default=cluster_mod.EMBED_CONCURRENCY,
+                    help="concurrent embedding requests, each on a keep-alive connection")
+    ap.add_argument("--embed-format", choices=quantize.FORMATS, default="f32",
+                    help="how cached embeddings are stored and compared (int8 is ~1/4 the size)")
+    ap.add_argument("--embed-dim", type=int, default=None,
+                    help="randomly project embeddings down to N dimensions before storing")
     ap.add_argument("--cap", type=int, default=20)
+    ap.add_argument("--judge-workers", type=int, default=judge_mod.JUDGE_WORKERS,
+                    help=f"judge in shards of {judge_mod.JUDGE_SHARD} prompts, N claude calls at a time")
+    ap.add_argument("--judge-deadline", type=float, default=judge_mod.JUDGE_TIMEOUT,
+                    help="seconds the whole judgment pass may take")
+    ap.add_argument("--judge-budget", type=int, default=judge_mod.JUDGE_BUDGET,
+                    help="estimated tokens the judge prompt may use; long prompts are truncated")
+    ap.add_argument("--judge-stream", action="store_true",
+                    help="read judgments as they stream in, saving each to judge-partial.jsonl")
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="parse transcripts in a process pool of this size")
+    ap.add_argument("--count", action="store_true",
+                    help="print how many prompts fall in the window, from the index")
+    ap.add_argument("--recompact-themes", action="store_true",
+                    help="merge persisted themes that have drifted together, then exit")
     args = ap.parse_args(argv)
+    if args.no_embed and args.cluster_method == "embeddings":
+        ap.error("--no-embed conflicts with --cluster-method embeddings")
+    codec = quantize.Codec(args.embed_format, args.embed_dim)
+
+    if args.recompact_themes:
+        store = themes_mod.ThemeStore(model=codec.space(cluster_mod.EMBED_MODEL))
+        before = len(store.themes)
+        merged = store.recompact(args.threshold)
+        store.save()
+        print(f"prompt-audit: merged {merged} of {before} themes")
+        return 0
 
     wm = common.read_json(common.watermark_path(), {}) or {}
     since = _since_from_arg(args.since, wm.get("last"))
-    prompts = collect.collect(since=since)
-    if not prompts:
-        print("prompt-audit: no new prompts since", since or "(beginning)")
+    index = common.read_json(common.index_path(), {}) or {}
+    if args.count:
+        low, high = collect.count_in_window(collect.refresh_index(index), since=since)
+        common.write_json(common.index_path(), index)
+        print(f"prompt-audit: {low if low == high else f'{low}-{high}'} prompts since",
+              since or "(beginning)")
         return 0
 
+    cursors = common.read_json(common.cursors_path(), {}) or {}
     files = rubric.load_all(REFERENCES)
-    rule_findings = {}
-    for i, p in enumerate(prompts):
-        det = rubric.resolve_for_model(p.get("model"), files)["deterministic"]
-        params, enabled = rules_mod.merge_params(det)
-        rule_findings[i] = rules_mod.apply_to_prompt(p["text"], params, enabled)
-
-    clusters, method = cluster_mod.cluster(
-        [p["text"] for p in prompts], use_embeddings=not args.no_embed)
-
-    judgment_by_model = {}
-    for p in prompts:
-        m = p.get("model")
-        if m and m not in judgment_by_model:
-            judgment_by_model[m] = rubric.resolve_for_model(m, files)["judgment"]
-
-    indices = judge_mod.select_items(prompts, clusters, rule_findings, cap=args.cap)
-    judge_results = [] if args.dry_run else judge_mod.judge(indices, prompts, judgment_by_model)
+    # Resuming from the watermark only needs each transcript's appended tail;
+    # an explicit --since may reach back before it, so rescan and re-record.
+    stream = collect.stream(since=since, cursors=cursors, index=index,
+                            resume=args.since is None, workers=args.workers)
+    store = seen.load()
+    rubric_key = rules_mod.rubric_key(files)
+    rules_mod.load_bundles(rubric_key)
+    # One pass over the stream. Only the first occurrence of each normalized
+    # text under each model's criteria (rule bundle and judgment guidance)
+    # goes on: it is what clustering and judging index into, with findings
+    # kept only for prompts that have some. Later occurrences just bump its
+    # count, so text typed to models with different criteria is checked and
+    # judged against each. Prompts without stored findings queue for the
+    # rules. The store's counts, and the report's repeats, only take
+    # occurrences it hasn't counted before.
+    prompts, counts, keys, sigs, first, latest, added = [], [], [], [], {}, [], []
+    guidance, typed = {}, set()
+    rule_findings, todo, models, newest, repeats = {}, {}, set(), "", 0
+    for p in stream:
+        ts = p.get("timestamp") or ""
+        newest = max(newest, ts)
+        k = seen.key(p["text"])
+        model = p.get("model")
+        bundle = rules_mod.bundle_for_model(model, files, rubric_key)
+        if model not in guidance:
+            guidance[model] = tuple(f.path for f in rubric.resolve_for_model(model, files)["judgment"])
+        slot = (k, bundle.signature, guidance[model])
+        new = seen.is_new(store.get(k), ts)
+        repeats += new and (k in store or k in typed)
+        typed.add(k)
+        if slot in first:
+            j = first[slot]
+            counts[j] += 1
+            added[j] += new
+            latest[j] = max(latest[j], ts)
+            continue
+        first[slot] = len(prompts)
+        findings = seen.cached_findings(store.get(k), bundle.signature)
+        if findings is None:
+            todo.setdefault(bundle.signature, (bundle, []))[1].append(len(prompts))
+        elif findings:
+            rule_findings[len(prompts)] = findings
+        prompts.append(p)
+        counts.append(1)
+        added.append(int(new))
+        latest.append(ts)
+        keys.append(k)
+        sigs.append(bundle.signature)
+        models.add(model)
+    _evaluate(todo, prompts, rule_findings)
+    if not prompts:
+        if not args.dry_run:
+            _save_scan_state(cursors, index)
+        print("prompt-audit: no new prompts since", since or "(beginning)")
+        return 0
 
-    summary = report_mod.summarize(prompts, rule_findings, clusters, method)
+    embedding = not args.no_embed and args.cluster_method in ("auto", "embeddings")
+    cache = embed_cache.EmbeddingCache(codec=codec) if embedding else None
+    theme_store = themes_mod.ThemeStore(model=codec.space(cluster_mod.EMBED_MODEL)) if embedding else None
+    sweep = dict.fromkeys(args.thresholds)
+    try:
+        unique_clusters, method = cluster_mod.cluster(
+            [p["text"] for p in prompts], threshold=args.threshold, use_embeddings=embedding,
+            batch_size=args.embed_batch, cache=cache, concurrency=args.embed_concurrency,
+            themes=theme_store, weights=added, method=args.cluster_method, sweep=sweep)
+    except cluster_mod.EmbeddingUnavailable as exc:   # only for an explicit --cluster-method embeddings
+        print(f"prompt-audit: can't cluster by embeddings: {exc}", file=sys.stderr)
+        return 1
+    if args.thresholds and method != "embeddings":
+        print(f"prompt-audit: --thresholds ignored: clustered by {method}, not embeddings",
+              file=sys.stderr)
+    clusters = seen.expand_clusters(unique_clusters, counts)
+    growth = theme_store.growth(clusters) if theme_store and method == "embeddings" else None
+
+    judgment_by_model = {m: rubric.resolve_for_model(m, files)["judgment"]
+                         for m in models if m}
+
+    judgments = judge_mod.load_cache()
+
+    def cached(i):
+        return judge_mod.cache_key(prompts[i], judgment_by_model) in judgments
+
+    indices = judge_mod.select_items(prompts, clusters, rule_findings, cap=args.cap, cached=cached)
+    if args.dry_run:   # cached judgments are free; skip only the paid call
+        indices = [i for i in indices if cached(i)]
+    packing: dict = {}
+    partial = judge_mod.PartialResults() if args.judge_stream and not args.dry_run else None
+    judge_results = judge_mod.judge(indices, prompts, judgment_by_model, cache=judgments,
+                                    workers=args.judge_workers, deadline=args.judge_deadline,
+                                    budget=args.judge_budget, packing=packing,
+                                    stream=args.judge_stream, partial=partial)
+
+    summary = report_mod.summarize(prompts, rule_findings, clusters, method,
+                                   counts=counts, repeats=repeats,
+                                   embed_cache=cache and cache.stats(), themes=growth,
+                                   sweep={t: cs for t, cs in sweep.items() if cs is not None},
+                                   judge_packing=packing)
     md = report_mod.render(summary, clusters, prompts, judge_results, report_mod.load_previous())
 
     if args.dry_run:
@@ -78,8 +231,15 @@ def run(argv=None):
 
     path = report_mod.write_report(md)
     report_mod.save_run(summary)
-    newest = max((p.get("timestamp") or "") for p in prompts)
+    rules_mod.save_bundles(rubric_key)
+    seen.save(seen.record(store, keys, latest, added, rule_findings, sigs))
+    if cache is not None:
+        cache.save()
+    if growth is not None:
+        theme_store.save()
+    judge_mod.save_cache(judgments)
     common.write_json(common.watermark_path(), {"last": newest})
+    _save_scan_state(cursors, index)
     print("prompt-audit: wrote", path)
     return 0
 
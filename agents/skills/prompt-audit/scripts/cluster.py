@@ -1,23 +1,60 @@
 """Semantic clustering via a local ollama embedding model, with a stdlib
-token-signature fallback when ollama is unavailable. Stdlib only (urllib for
-ollama's HTTP API)."""
+MinHash near-duplicate fallback when ollama is unavailable. Stdlib only
+(urllib for ollama's HTTP API)."""
 from __future__ import annotations
 
+import hashlib
+import http.client
 import json
 import math
+import operator
+import random
 import re
+import threading
+import time
 import urllib.error
+import urllib.parse
 import urllib.request
+from array import array
+from collections import Counter
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import quantize
+
+try:  # optional: scores a vector against every seed in one call
+    import numpy as np
+except ImportError:
+    np = None
 
 OLLAMA_EMBED_URL = "http://localhost:11434/api/embeddings"
+OLLAMA_EMBED_BATCH_URL = "http://localhost:11434/api/embed"
 OLLAMA_TAGS_URL = "http://localhost:11434/api/tags"
 EMBED_MODEL = "nomic-embed-text"
+EMBED_BATCH = 64
+EMBED_CONCURRENCY = 1
+EMBED_DEADLINE = 300.0
+EMBED_RETRIES = 2
+ANN_THRESHOLD = 20_000
+SWEEP_ANN_THRESHOLD = 1_000   # all-pairs is O(n²), not greedy's O(n·clusters)
+LSH_TABLES = 12
+LSH_BITS = 8
+MINHASH_BANDS = 8
+MINHASH_ROWS = 4
+MINHASH_THRESHOLD = 0.5
+TFIDF_THRESHOLD = 0.5
+TFIDF_SALIENT = 3
+METHODS = ("auto", "embeddings", "tfidf", "minhash")
 
 
 class EmbeddingUnavailable(Exception):
     pass
 
 
+class _BatchUnsupported(Exception):
+    """The server has no usable batch endpoint (older ollama); use the
+    single-prompt one instead."""
+
+
 def _embed_one(text, url, model, timeout=30):
     payload = json.dumps({"model": model, "prompt": text}).encode()
     req = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
@@ -32,8 +69,164 @@ def _embed_one(text, url, model, timeout=30):
     return vec
 
 
-def embed(texts, url=OLLAMA_EMBED_URL, model=EMBED_MODEL):
-    return [_embed_one(t, url, model) for t in texts]
+def _embed_batch(texts, url, model, timeout=120):
+    payload = json.dumps({"model": model, "input": texts}).encode()
+    req = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            data = json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        if exc.code in (400, 404, 405, 501):
+            raise _BatchUnsupported(str(exc)) from exc
+        raise EmbeddingUnavailable(str(exc)) from exc
+    except (urllib.error.URLError, OSError, json.JSONDecodeError) as exc:
+        raise EmbeddingUnavailable(str(exc)) from exc
+    vecs = data.get("embeddings") if isinstance(data, dict) else None
+    if not isinstance(vecs, list) or len(vecs) != len(texts) or not all(vecs):
+        raise _BatchUnsupported("no batch embeddings in response")
+    return vecs
+
+
+def _embed_all(texts, url, model, batch_url, batch_size, concurrency=1, deadline=EMBED_DEADLINE):
+    if concurrency > 1 and texts:
+        return _embed_concurrent(texts, url, model, batch_url, batch_size, concurrency, deadline)
+    vecs = []
+    if batch_size > 1 and batch_url:
+        try:
+            for lo in range(0, len(texts), batch_size):
+                vecs.extend(_embed_batch(texts[lo:lo + batch_size], batch_url, model))
+        except _BatchUnsupported:
+            pass
+    return vecs + [_embed_one(t, url, model) for t in texts[len(vecs):]]
+
+
+class _KeepAlive:
+    """One persistent HTTP connection per worker thread and host."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.opened = []
+
+    def post(self, url, payload, timeout):
+        parts = urllib.parse.urlsplit(url)
+        conns = self.local.__dict__.setdefault("conns", {})
+        conn = conns.get(parts.netloc)
+        if conn is None:
+            conn = conns[parts.netloc] = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+            with self.lock:
+                self.opened.append(conn)
+        conn.timeout = timeout
+        if conn.sock:
+            conn.sock.settimeout(timeout)
+        try:
+            conn.request("POST", parts.path, body=json.dumps(payload).encode(),
+                         headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next attempt; the server may have dropped an idle one.
+            conn.close()
+            del conns[parts.netloc]
+            raise
+
+    def close(self):
+        with self.lock:
+            for conn in self.opened:
+                conn.close()
+
+
+def _fetch(client, url, payload, end, batch=False):
+    """One embedding request with retries on transient failures (connection
+    errors, 429, 5xx), never past the global deadline `end`."""
+    err = None
+    for attempt in range(EMBED_RETRIES + 1):
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            status, body = client.post(url, payload, timeout=min(remaining, 120))
+        except (OSError, http.client.HTTPException) as exc:
+            err = exc
+        else:
+            if batch and status in (400, 404, 405, 501):
+                raise _BatchUnsupported(f"HTTP {status}")
+            if status == 200:
+                try:
+                    data = json.loads(body)
+                except json.JSONDecodeError as exc:
+                    raise EmbeddingUnavailable(str(exc)) from exc
+                if not batch:
+                    if not isinstance(data, dict) or not data.get("embedding"):
+                        raise EmbeddingUnavailable("no embedding in response")
+                    return [data["embedding"]]
+                vecs = data.get("embeddings") if isinstance(data, dict) else None
+                if not isinstance(vecs, list) or len(vecs) != len(payload["input"]) or not all(vecs):
+                    raise _BatchUnsupported("no batch embeddings in response")
+                return vecs
+            if status != 429 and status < 500:
+                raise EmbeddingUnavailable(f"HTTP {status}")
+            err = f"HTTP {status}"
+        time.sleep(min(0.25 * 2 ** attempt, max(0.0, end - time.monotonic())))
+    raise EmbeddingUnavailable(f"embedding failed before the deadline: {err}")
+
+
+def _map_until(fn, items, workers, end):
+    """fn over items on a thread pool, results in input order; the first
+    failure, or the deadline, abandons whatever is still running."""
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(fn, x) for x in items]
+        done, pending = wait(futures, timeout=max(0.0, end - time.monotonic()),
+                             return_when=FIRST_EXCEPTION)
+        for f in futures:
+            if f in done and f.exception():
+                raise f.exception()
+        if pending:
+            raise EmbeddingUnavailable("embedding deadline passed")
+        return [f.result() for f in futures]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _embed_concurrent(texts, url, model, batch_url, batch_size, workers, deadline):
+    client, end = _KeepAlive(), time.monotonic() + deadline
+    try:
+        if batch_size > 1 and batch_url:
+            chunks = [texts[lo:lo + batch_size] for lo in range(0, len(texts), batch_size)]
+            try:
+                return [v for vecs in _map_until(
+                    lambda c: _fetch(client, batch_url, {"model": model, "input": c}, end, batch=True),
+                    chunks, workers, end) for v in vecs]
+            except _BatchUnsupported:
+                pass
+        return [vecs[0] for vecs in _map_until(
+            lambda t: _fetch(client, url, {"model": model, "prompt": t}, end), texts, workers, end)]
+    finally:
+        # Also unblocks any worker still waiting on a response.
+        client.close()
+
+
+def embed(texts, url=OLLAMA_EMBED_URL, model=EMBED_MODEL,
+          batch_url=OLLAMA_EMBED_BATCH_URL, batch_size=EMBED_BATCH, cache=None,
+          concurrency=EMBED_CONCURRENCY, deadline=EMBED_DEADLINE):
+    """Embed texts in chunks of `batch_size` per request to ollama's batch
+    endpoint, falling back to one request per text if the server doesn't
+    support batching. With a `cache`, only texts it misses go to ollama.
+    With `concurrency` > 1, requests run on that many threads, each over its
+    own keep-alive connection, with per-request retries and a global
+    `deadline` in seconds. Raises EmbeddingUnavailable if ollama can't be
+    reached or the deadline passes."""
+    if cache is None:
+        return _embed_all(texts, url, model, batch_url, batch_size, concurrency, deadline)
+    vecs = cache.get_many(model, texts)
+    todo = [i for i, v in enumerate(vecs) if v is None]
+    if todo:
+        fresh = _embed_all([texts[i] for i in todo], url, model, batch_url, batch_size,
+                           concurrency, deadline)
+        for i, v in zip(todo, fresh):
+            vecs[i] = cache.put(model, texts[i], v)
+    return vecs
 
 
 def ollama_available(url=OLLAMA_TAGS_URL, timeout=2):
@@ -44,24 +237,219 @@ def ollama_available(url=OLLAMA_TAGS_URL, timeout=2):
         return False
 
 
-def _cosine(a, b):
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(y * y for y in b))
-    return 0.0 if na == 0 or nb == 0 else dot / (na * nb)
+def normalize(vec):
+    """`vec` scaled to unit length as float32, so cosine is a dot product."""
+    norm = math.sqrt(sum(x * x for x in vec))
+    return array("f", [x / norm for x in vec] if norm else vec)
 
 
-def greedy_cluster(vectors, threshold=0.83):
-    clusters = []
-    for i, v in enumerate(vectors):
-        for c in clusters:
-            if _cosine(v, c["seed"]) >= threshold:
-                c["members"].append(i)
+def _dot(a, b):
+    return sum(map(operator.mul, a, b))
+
+
+def _unit(vectors):
+    """Vectors ready for clustering: int8 QVecs (unit length before they
+    were quantized) stay as they are, everything else is normalized."""
+    return [v if isinstance(v, quantize.QVec) else normalize(v) for v in vectors]
+
+
+def _floats(v):
+    """A vector as a list of floats for the hot loop. A QVec is widened one
+    vector at a time, so the working set stays int8: CPython multiplies
+    floats faster than ints past the small-int cache, which an int8 dot
+    product (QVec.dot) leaves after a couple of terms."""
+    if isinstance(v, quantize.QVec):
+        s = v.scale
+        return [x * s for x in v.q.tolist()]
+    return v.tolist()
+
+
+class SeedIndex:
+    """Random-hyperplane LSH over cluster seeds: `tables` hash tables, each
+    keyed by which side of `bits` random hyperplanes a vector falls on. A
+    vector is only compared against seeds sharing a bucket with it in some
+    table, so seeds at a small angle to it are found with high probability
+    without scanning them all."""
+
+    def __init__(self, dim, tables=None, bits=None, seed=0):
+        tables, bits = tables or LSH_TABLES, bits or LSH_BITS
+        rng = random.Random(seed)
+        self.planes = [[rng.gauss(0.0, 1.0) for _ in range(dim)] for _ in range(tables * bits)]
+        self.matrix = np.asarray(self.planes, dtype=np.float32) if np is not None else None
+        self.bits = bits
+        self.buckets = [{} for _ in range(tables)]
+
+    def keys(self, v):
+        if self.matrix is not None and not isinstance(v, list):
+            signs = (self.matrix @ v >= 0).tolist()
+        else:
+            signs = [_dot(v, p) >= 0 for p in self.planes]
+        b = self.bits
+        return [sum(s << i for i, s in enumerate(signs[t:t + b])) for t in range(0, len(signs), b)]
+
+    def candidates(self, keys):
+        """Seeds in any of the vector's buckets, oldest first, as greedy
+        assignment expects."""
+        found = set()
+        for table, k in zip(self.buckets, keys):
+            found.update(table.get(k, ()))
+        return sorted(found)
+
+    def add(self, c, keys):
+        for table, k in zip(self.buckets, keys):
+            table.setdefault(k, []).append(c)
+
+
+def _greedy_python(unit, threshold, index=None, seeds=()):
+    # Floats unboxed from an array cost more per multiply than a list's, so
+    # the hot loop works on a list copy of each vector; only seeds persist.
+    seeds, assign = [_floats(s) for s in seeds], []
+    if index:
+        for c, s in enumerate(seeds):
+            index.add(c, index.keys(s))
+    for v in unit:
+        v = _floats(v)
+        keys = index.keys(v) if index else None
+        for c in (index.candidates(keys) if index else range(len(seeds))):
+            if _dot(v, seeds[c]) >= threshold:
                 break
         else:
-            clusters.append({"members": [i], "seed": v})
-    return [{"members": c["members"], "representative": c["members"][0], "size": len(c["members"])}
-            for c in clusters]
+            c = len(seeds)
+            seeds.append(v)
+            if index:
+                index.add(c, keys)
+        assign.append(c)
+    return assign
+
+
+def _matrix(unit):
+    """Unit vectors as a float32 matrix; int8 rows are scaled back, since
+    an int8 matmul would overflow without widening anyway."""
+    if unit and isinstance(unit[0], quantize.QVec):
+        q = np.frombuffer(b"".join(v.q.tobytes() for v in unit), dtype=np.int8)
+        scales = np.asarray([v.scale for v in unit], dtype=np.float32)
+        return q.reshape(len(unit), -1).astype(np.float32) * scales[:, None]
+    return np.asarray(unit, dtype=np.float32)
+
+
+def _greedy_numpy(unit, threshold, index=None, seeds=()):
+    m = _matrix(unit)
+    k = len(seeds)
+    grown = np.empty((max(k, min(len(m), 64)), m.shape[1]), dtype=np.float32)
+    grown[:k] = np.asarray(seeds, dtype=np.float32).reshape(k, m.shape[1])
+    seeds, assign = grown, []
+    if index:
+        for c in range(k):
+            index.add(c, index.keys(seeds[c]))
+    for v in m:
+        if index:
+            keys = index.keys(v)
+            cands = np.asarray(index.candidates(keys), dtype=np.intp)
+            hits = cands[np.flatnonzero(seeds[cands] @ v >= threshold)]
+        else:
+            hits = np.flatnonzero(seeds[:k] @ v >= threshold)
+        if hits.size:
+            assign.append(int(hits[0]))
+            continue
+        if k == len(seeds):
+            seeds = np.concatenate([seeds, np.empty_like(seeds)])
+        seeds[k] = v
+        if index:
+            index.add(k, keys)
+        assign.append(k)
+        k += 1
+    return assign
+
+
+def greedy_cluster(vectors, threshold=0.83, ann=None, seeds=()):
+    """Each vector joins the first seed it is at least `threshold` cosine-
+    similar to, else seeds a cluster of its own. With `ann` (by default, from
+    ANN_THRESHOLD vectors and seeds up) only seeds an LSH index turns up as
+    candidates are compared, which can miss a matching seed and start a new
+    cluster. `seeds` are existing unit-length cluster centres, tried ahead
+    of any new seed; a cluster that joined one carries its position as
+    "seed". int8 QVecs are clustered as they are, without renormalizing."""
+    unit = _unit(vectors)
+    if ann is None:
+        ann = len(unit) + len(seeds) >= ANN_THRESHOLD
+    index = SeedIndex(len(unit[0])) if ann and unit else None
+    assign = (_greedy_numpy if np is not None and unit else _greedy_python)(unit, threshold, index, seeds)
+    members: dict = {}
+    for i, c in enumerate(assign):
+        members.setdefault(c, []).append(i)
+    clusters = []
+    for c, m in members.items():
+        clusters.append({"members": m, "representative": m[0], "size": len(m)})
+        if c < len(seeds):
+            clusters[-1]["seed"] = c
+    return clusters
+
+
+def neighbour_edges(unit, floor, ann=None):
+    """(similarity, i, j), i < j, for every pair of unit vectors at least
+    `floor` similar. With NumPy, blocks of rows against the whole matrix;
+    else every pair, or from SWEEP_ANN_THRESHOLD vectors (or with `ann`)
+    only pairs sharing an LSH bucket, which can miss a few edges."""
+    n = len(unit)
+    if np is not None and n:
+        m = np.asarray(unit, dtype=np.float32)
+        edges = []
+        for lo in range(0, n, 1024):
+            sims = m[lo:lo + 1024] @ m.T
+            ii, jj = np.nonzero(sims >= floor)
+            keep = jj > ii + lo
+            ii, jj = ii[keep], jj[keep]
+            edges += zip(sims[ii, jj].tolist(), (ii + lo).tolist(), jj.tolist())
+        return edges
+    lists = [v.tolist() for v in unit]
+    if ann is None:
+        ann = n >= SWEEP_ANN_THRESHOLD
+    if ann and n:
+        index = SeedIndex(len(lists[0]))
+        for i, v in enumerate(lists):
+            index.add(i, index.keys(v))
+        pairs = {(a, b) for table in index.buckets for ids in table.values()
+                 for x, a in enumerate(ids) for b in ids[x + 1:]}
+    else:
+        pairs = ((i, j) for i in range(n) for j in range(i + 1, n))
+    edges = []
+    for i, j in pairs:
+        sim = _dot(lists[i], lists[j])
+        if sim >= floor:
+            edges.append((sim, i, j))
+    return edges
+
+
+def threshold_sweep(vectors, thresholds, ann=None):
+    """Single-linkage clusterings at each of `thresholds`, from one pass
+    over the neighbour graph: edges sorted by similarity are unioned in as
+    the threshold falls, and the components read off at each step. Unlike
+    greedy_cluster, similarity chains (a~b, b~c puts a with c)."""
+    unit = [normalize(v) for v in vectors]
+    ts = sorted(set(thresholds), reverse=True)
+    if not unit or not ts:
+        return {}
+    edges = sorted(neighbour_edges(unit, ts[-1], ann), reverse=True)
+    parent = list(range(len(unit)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    out, e = {}, 0
+    for t in ts:
+        while e < len(edges) and edges[e][0] >= t:
+            a, b = find(edges[e][1]), find(edges[e][2])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+            e += 1
+        groups: dict = {}
+        for i in range(len(unit)):
+            groups.setdefault(find(i), []).append(i)
+        out[t] = [{"members": m, "representative": m[0], "size": len(m)} for m in groups.values()]
+    return out
 
 
 _WORD = re.compile(r"[a-z0-9]+")
@@ -73,10 +461,161 @@ def token_signature_cluster(texts, k=2):
     return [{"members": m, "representative": m[0], "size": len(m)} for m in groups.values()]
 
 
-def cluster(texts, threshold=0.83, use_embeddings=True):
-    if use_embeddings and ollama_available():
+_STOP = frozenset("a an the this that these those it its to of in on for with and or is be "
+                  "i me my we our you your can could would will please just".split())
+
+
+def shingles(text):
+    """Content words and their adjacent pairs: word order matters a little,
+    not entirely, and filler like "can you" or "please" not at all."""
+    words = [w for w in _WORD.findall(text.lower()) if w not in _STOP]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(text, size=MINHASH_BANDS * MINHASH_ROWS):
+    """MinHash signature of `size` (at most 32) 16-bit values. Each shingle
+    is hashed once, its blake2b digest read as `size` independent hashes."""
+    top = array("H", [0xFFFF]) * size
+    digests = [array("H", hashlib.blake2b(s.encode(), digest_size=2 * size).digest())
+               for s in shingles(text)]
+    return tuple(map(min, top, *digests)) if digests else tuple(top)
+
+
+def minhash_cluster(texts, threshold=MINHASH_THRESHOLD, bands=MINHASH_BANDS, rows=MINHASH_ROWS):
+    """Near-duplicate clusters in about linear time: each text's MinHash
+    signature is split into `bands` bands of `rows` values, and a text is
+    only compared with clusters whose representative shares a band with it.
+    It joins the first one whose estimated Jaccard similarity (the share of
+    equal signature values) is at least `threshold`."""
+    need = threshold * bands * rows
+    buckets: dict = {}
+    reps, clusters = [], []
+    for i, t in enumerate(texts):
+        sig = minhash(t, bands * rows)
+        keys = [(b, sig[b * rows:(b + 1) * rows]) for b in range(bands)]
+        candidates = sorted({c for key in keys for c in buckets.get(key, ())})
+        c = next((c for c in candidates if sum(map(operator.eq, sig, reps[c])) >= need), None)
+        if c is None:
+            c = len(clusters)
+            reps.append(sig)
+            clusters.append([])
+            for key in keys:
+                buckets.setdefault(key, []).append(c)
+        clusters[c].append(i)
+    return [{"members": m, "representative": m[0], "size": len(m)} for m in clusters]
+
+
+def _terms(text):
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOP]
+
+
+def tfidf_vectors(texts):
+    """Unit-length sparse TF-IDF vectors ({term: weight}) over `texts`. IDF
+    is square-rooted, so in a small run a word unique to one short prompt
+    doesn't swamp the words it shares with others."""
+    docs = [Counter(_terms(t)) for t in texts]
+    df = Counter(term for d in docs for term in d)
+    n = len(docs)
+    idf = {term: math.sqrt(math.log((1 + n) / (1 + k)) + 1) for term, k in df.items()}
+    vecs = []
+    for d in docs:
+        v = {term: tf * idf[term] for term, tf in d.items()}
+        norm = math.sqrt(sum(w * w for w in v.values()))
+        vecs.append({term: w / norm for term, w in v.items()} if norm else v)
+    return vecs
+
+
+def _sparse_dot(a, b):
+    if len(b) < len(a):
+        a, b = b, a
+    return sum(w * b.get(term, 0.0) for term, w in a.items())
+
+
+def _salient(vec, k):
+    return sorted(vec, key=lambda term: (-vec[term], term))[:k]
+
+
+def keywords(vecs, members, k=5):
+    """The `k` terms with the most TF-IDF weight across a cluster's members."""
+    total: Counter = Counter()
+    for m in members:
+        total.update(vecs[m])
+    return [term for term, _ in sorted(total.items(), key=lambda kv: (-kv[1], kv[0]))[:k]]
+
+
+def tfidf_cluster(texts, threshold=TFIDF_THRESHOLD, salient=TFIDF_SALIENT, k=5):
+    """Topical clusters from sparse TF-IDF vectors. A text joins the first
+    cluster whose centroid (the running sum of its members' vectors) it is
+    at least `threshold` cosine-similar to, else starts one. An inverted
+    index maps each member's `salient` top-weighted terms to its cluster, so
+    only clusters sharing one of the text's own salient terms are compared.
+    Each cluster carries its top `k` "keywords"; texts with no content
+    words share one cluster."""
+    vecs = tfidf_vectors(texts)
+    index: dict = {}
+    sums, sq, clusters, empty = [], [], [], None
+    for i, v in enumerate(vecs):
+        top = _salient(v, salient)
+        candidates = sorted({c for term in top for c in index.get(term, ())})
+        c = None
+        for cand in candidates:
+            dot = sum(w * sums[cand].get(term, 0.0) for term, w in v.items())
+            if dot >= threshold * math.sqrt(sq[cand]):
+                c = cand
+                break
+        if c is None and not v and empty is not None:
+            c = empty
+        if c is None:
+            c = len(clusters)
+            sums.append(dict(v))
+            sq.append(float(bool(v)))
+            clusters.append([])
+            if not v:
+                empty = c
+        elif v:
+            for term, w in v.items():
+                sums[c][term] = sums[c].get(term, 0.0) + w
+            # |s + v|² = |s|² + 2 s·v + |v|², with |v| = 1.
+            sq[c] += 2 * dot + 1
+        for term in top:
+            index.setdefault(term, set()).add(c)
+        clusters[c].append(i)
+    return [{"members": m, "representative": m[0], "size": len(m), "keywords": keywords(vecs, m, k)}
+            for m in clusters]
+
+
+def cluster(texts, threshold=0.83, use_embeddings=True, batch_size=EMBED_BATCH, cache=None,
+            concurrency=EMBED_CONCURRENCY, deadline=EMBED_DEADLINE, themes=None, weights=None,
+            method="auto", sweep=None):
+    """Cluster `texts` by `method` (one of METHODS); returns the clusters and
+    the method actually used. "auto" embeds with ollama and falls back to
+    MinHash near-duplicates if it can't embed them; "embeddings" insists,
+    raising EmbeddingUnavailable instead; "tfidf" and "minhash" run locally. With a `themes` store, embedding clusters first
+    join the persisted themes, which then absorb them (`weights` is how many
+    occurrences of each text the themes haven't counted yet). `sweep`, a dict keyed by thresholds, is
+    filled in with threshold_sweep's clusterings when embeddings are used,
+    from the same vectors."""
+    if method == "tfidf":
+        return tfidf_cluster(texts), "tfidf"
+    use_embeddings = use_embeddings and method != "minhash"
+    # A fully cached run clusters by embeddings even with ollama down.
+    cached = cache is not None and cache.covers(EMBED_MODEL, texts)
+    available = use_embeddings and (cached or ollama_available())
+    if method == "embeddings" and not available:
+        raise EmbeddingUnavailable("ollama is not reachable")
+    if available:
         try:
-            return greedy_cluster(embed(texts), threshold=threshold), "embeddings"
+            vecs = embed(texts, batch_size=batch_size, cache=cache,
+                         concurrency=concurrency, deadline=deadline)
+            if sweep:
+                sweep.update(threshold_sweep(vecs, list(sweep)))
+            if themes is None:
+                return greedy_cluster(vecs, threshold=threshold), "embeddings"
+            unit = _unit(vecs)
+            clusters = greedy_cluster(unit, threshold=threshold, seeds=themes.seeds())
+            themes.absorb(clusters, unit, texts, weights or [1] * len(texts))
+            return clusters, "embeddings"
         except EmbeddingUnavailable:
-            pass
-    return token_signature_cluster(texts), "token-signature"
+            if method == "embeddings":
+                raise
+    return minhash_cluster(texts), "minhash"
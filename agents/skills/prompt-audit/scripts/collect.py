@@ -5,8 +5,12 @@ system injections, slash-command scaffolding, and multi-agent transport noise
 from __future__ import annotations
 
 import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
 import common
 
@@ -16,10 +20,66 @@ _DROP_PREFIXES = (
     "<local-command-stdout>", "<user-prompt-submit-hook>", "<post-tool-use-hook>",
     "<user-memory-input>",
 )
-_NOISE = re.compile(r"^(<teammate-message|<bash-(input|stdout|stderr)|task-notification)", re.I)
-# Anchored: a slash-command scaffold *opens* with the tag, so only a leading
-# match is scaffolding. A genuine prompt that merely quotes the tag is kept.
-_COMMAND_NAME = re.compile(r"^<command-name>[^<]+</command-name>")
+# Transport noise and slash-command scaffolding, judged on the raw text. Matched
+# at the start only: a scaffold *opens* with its tag, so a genuine prompt that
+# merely quotes <command-name> is kept.
+_SCAFFOLD = (r"(?i:<teammate-message|<bash-(?:input|stdout|stderr)|task-notification)"
+             r"|<command-name>[^<]+</command-name>|<command-message>|<command-args>")
+_INJECTED = "|".join(re.escape(p) for p in _DROP_PREFIXES)
+_INJECTED_RE = re.compile(_INJECTED)
+# One anchored match over the leading bytes decides drop. Stripping a later
+# system reminder can't disturb a leading match, so only text carrying the tag
+# needs the injected-prefix check again after stripping.
+_DROP = re.compile(f"{_SCAFFOLD}|{_INJECTED}")
+_REMINDER_TAG = "<system-reminder>"
+# Only user turns (prompts) and assistant turns (model attribution) matter, so
+# the transcript scanner skips every other line without decoding it.
+_EVENT_TYPES = re.compile(rb'"type":\s*"(?:user|assistant)"')
+# Unanswered prompts held for model attribution, across all sessions in a stream.
+_MAX_PENDING = 256
+
+
+def _intern(s):
+    return sys.intern(s) if type(s) is str else s
+
+
+class Prompt:
+    """One collected prompt. Slotted, and the fields that repeat across
+    hundreds of thousands of records (project, session, model) are interned,
+    so each record costs one small object plus its text. Reads like the dict
+    it replaced: `p["text"]`, `p.get("model")`."""
+    __slots__ = ("text", "project", "session", "timestamp", "model")
+
+    def __init__(self, text, project="", session=None, timestamp=None, model=None):
+        self.text = text
+        self.project = _intern(project)
+        self.session = _intern(session)
+        self.timestamp = timestamp
+        self.model = _intern(model)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def _fields(self):
+        return (self.text, self.project, self.session, self.timestamp, self.model)
+
+    def __eq__(self, other):
+        return isinstance(other, Prompt) and self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Rebuild through __init__ so records coming back from a worker
+        # process are re-interned in this one.
+        return Prompt, self._fields()
+
+    def __repr__(self):
+        return f"Prompt({self.text[:40]!r}, model={self.model!r}, timestamp={self.timestamp!r})"
 
 
 def _text_of(content) -> str:
@@ -49,47 +109,221 @@ def _is_genuine(event: dict) -> bool:
 
 def _clean(text: str):
     t = text.strip()
-    if not t or _NOISE.search(t) or _COMMAND_NAME.search(t):
-        return None
-    if t.startswith("<command-message>") or t.startswith("<command-args>"):
-        return None
-    t = _SYSTEM_REMINDER.sub("", t).strip()
-    if not t or t.startswith(_DROP_PREFIXES):
+    if not t or _DROP.match(t):
         return None
+    if _REMINDER_TAG in t:
+        t = _SYSTEM_REMINDER.sub("", t).strip()
+        if not t or _INJECTED_RE.match(t):
+            return None
     return t
 
 
-def prompts_from_events(events: Iterable[dict]) -> list[dict]:
-    prompts: list[dict] = []
+def _since_ok(ts, since) -> bool:
+    return not since or (ts or "") > since
+
+
+def iter_prompts(events: Iterable[dict], since: str | None = None) -> Iterator[Prompt]:
+    """Stream prompts out of an event stream, in the order they were typed. A
+    prompt is held until its session's next assistant turn names the model,
+    and then until every prompt typed before it has been emitted; prompts
+    still unanswered are flushed unlabelled, oldest first, when the stream
+    ends or more than _MAX_PENDING are held. Prompts at or before `since` are
+    dropped as they arrive, before cleaning."""
+    held: deque = deque()
     pending: dict = {}
     for ev in events:
         session = ev.get("sessionId")
         if ev.get("type") == "assistant":
             model = (ev.get("message") or {}).get("model")
-            if model and pending.get(session):
-                for p in pending[session]:
-                    p["model"] = model
-                pending[session] = []
+            if model and session in pending:
+                model = _intern(model)
+                for p in pending.pop(session):
+                    p.model = model
+                while held and held[0].model is not None:
+                    yield held.popleft()
             continue
-        if not _is_genuine(ev):
+        if not _is_genuine(ev) or not _since_ok(ev.get("timestamp"), since):
             continue
         text = _clean(_text_of((ev.get("message") or {}).get("content")))
         if text is None:
             continue
         cwd = ev.get("cwd") or ""
-        rec = {"text": text, "project": Path(cwd).name if cwd else "",
-               "session": session, "timestamp": ev.get("timestamp"), "model": None}
-        prompts.append(rec)
+        rec = Prompt(text, Path(cwd).name if cwd else "", session, ev.get("timestamp"))
         pending.setdefault(session, []).append(rec)
-    return prompts
+        held.append(rec)
+        while len(held) > _MAX_PENDING:
+            # The oldest prompt gives up on its answer, releasing those behind it.
+            stale = held.popleft()
+            if stale.model is None:
+                waiting = pending[stale.session]
+                waiting.remove(stale)
+                if not waiting:
+                    del pending[stale.session]
+            yield stale
+            while held and held[0].model is not None:
+                yield held.popleft()
+    yield from held
+
+
+def prompts_from_events(events: Iterable[dict]) -> list[Prompt]:
+    return list(iter_prompts(events))
+
+
+def collect_from(events: Iterable[dict], since: str | None = None) -> list[Prompt]:
+    return list(iter_prompts(events, since=since))
 
 
-def collect_from(events: Iterable[dict], since: str | None = None) -> list[dict]:
-    prompts = prompts_from_events(events)
-    if since:
-        prompts = [p for p in prompts if (p.get("timestamp") or "") > since]
+def _observe(events: Iterable[dict], stats: dict) -> Iterator[dict]:
+    for ev in events:
+        ts = ev.get("timestamp")
+        if isinstance(ts, str) and ts:
+            if stats["min"] is None or ts < stats["min"]:
+                stats["min"] = ts
+            if stats["max"] is None or ts > stats["max"]:
+                stats["max"] = ts
+        yield ev
+
+
+def _fresh(entry, st) -> bool:
+    return bool(entry) and entry.get("mtime") == st.st_mtime_ns and entry.get("size") == st.st_size
+
+
+def scan_file(path: Path, since: str | None = None, cursors: dict | None = None,
+              index: dict | None = None, resume: bool = True) -> list[Prompt]:
+    """Collect one transcript. A fresh index entry whose newest user/assistant
+    event is at or before `since` skips the file unopened; otherwise the entry
+    is refreshed from what was read (merged when only the appended tail was,
+    and the entry covers exactly the bytes before it)."""
+    key = str(path)
+    try:
+        st = path.stat()
+    except OSError:
+        return []
+    entry = (index or {}).get(key)
+    if since and _fresh(entry, st) and (entry.get("max") or "") <= since:
+        return []
+    start = common.resume_offset(path, cursors.get(key)) if resume and cursors is not None else 0
+    stats = {"min": None, "max": None}
+    # Read against a private cursor, so the index learns where this read ended.
+    read: dict = {}
+    events = _observe(common.iter_file_events(path, read, start=start, prefilter=_EVENT_TYPES), stats)
+    if index is None:
+        prompts = list(iter_prompts(events, since=since))
+    else:
+        # The index counts every prompt in the file, so `since` applies after counting.
+        prompts, count = [], 0
+        for p in iter_prompts(events):
+            count += 1
+            if _since_ok(p.timestamp, since):
+                prompts.append(p)
+    if cursors is not None and key in read:
+        cursors[key] = read[key]
+    if index is None:
+        return prompts
+    if start and entry and entry.get("end") == start:
+        lows = [x for x in (entry.get("min"), stats["min"]) if x]
+        highs = [x for x in (entry.get("max"), stats["max"]) if x]
+        stats = {"min": min(lows, default=None), "max": max(highs, default=None)}
+        count += entry.get("prompts", 0)
+    elif start:
+        # The entry doesn't end where this read began (say, refresh_index
+        # rescanned past the cursor), so its count can't be extended: recount.
+        stats = {"min": None, "max": None}
+        count = sum(1 for _ in iter_prompts(_observe(
+            common.iter_file_events(path, {}, start=0, prefilter=_EVENT_TYPES), stats)))
+    index[key] = {"mtime": st.st_mtime_ns, "size": st.st_size, "end": read.get(key, {}).get("offset"),
+                  "min": stats["min"], "max": stats["max"], "prompts": count}
     return prompts
 
 
-def collect(root: Path | None = None, since: str | None = None) -> list[dict]:
-    return collect_from(common.iter_events(root or common.projects_root()), since=since)
+def _scan_job(job):
+    """Process-pool worker: scan one transcript against private copies of its
+    cursor and index entries and hand back the updated entries."""
+    path, since, cursor, entry, resume = job
+    key = str(path)
+    cursors = {key: cursor} if cursor else {}
+    index = {key: entry} if entry else {}
+    prompts = scan_file(path, since=since, cursors=cursors, index=index, resume=resume)
+    return prompts, cursors.get(key), index.get(key)
+
+
+def _iter_parallel(paths, since, cursors, index, resume, workers):
+    jobs = [(p, since, (cursors or {}).get(str(p)), (index or {}).get(str(p)), resume)
+            for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunk = max(1, len(jobs) // (workers * 4))
+        # map() yields in submission order, so the merge matches the serial walk.
+        for path, (found, cursor, entry) in zip(paths, pool.map(_scan_job, jobs, chunksize=chunk)):
+            if cursors is not None and cursor:
+                cursors[str(path)] = cursor
+            if index is not None and entry:
+                index[str(path)] = entry
+            yield from found
+
+
+def stream(root: Path | None = None, since: str | None = None,
+           cursors: dict | None = None, index: dict | None = None,
+           resume: bool = True, workers: int = 1) -> Iterator[Prompt]:
+    """Prompts from every transcript under `root`, one transcript at a time.
+    Model attribution is per transcript: a prompt is labelled by the next
+    assistant turn in its own file. With `workers` > 1 transcripts are parsed
+    in a process pool; the serial walk is the fallback if the pool can't run.
+    Cursors and index entries of transcripts that no longer exist are dropped."""
+    paths = common.transcript_paths(root or common.projects_root())
+    _prune(paths, cursors, index)
+    if workers > 1 and len(paths) > 1:
+        started = False
+        try:
+            for p in _iter_parallel(paths, since, cursors, index, resume, workers):
+                started = True
+                yield p
+            return
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            if started:
+                raise
+    for path in paths:
+        yield from scan_file(path, since=since, cursors=cursors, index=index, resume=resume)
+
+
+def collect(root: Path | None = None, since: str | None = None,
+            cursors: dict | None = None, index: dict | None = None,
+            resume: bool = True, workers: int = 1) -> list[Prompt]:
+    return list(stream(root, since=since, cursors=cursors, index=index,
+                       resume=resume, workers=workers))
+
+
+def _prune(paths, *stores):
+    live = {str(p) for p in paths}
+    for store in stores:
+        for key in set(store or ()) - live:
+            del store[key]
+
+
+def refresh_index(index: dict, root: Path | None = None) -> dict:
+    paths = common.transcript_paths(root or common.projects_root())
+    _prune(paths, index)
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if not _fresh(index.get(str(path)), st):
+            scan_file(path, index=index, resume=False)
+    return index
+
+
+def count_in_window(index: dict, since: str | None = None, until: str | None = None) -> tuple[int, int]:
+    """Bounds on the number of genuine prompts in (since, until] from the index
+    alone: transcripts wholly inside the window count toward both, transcripts
+    straddling an edge only toward the upper bound."""
+    low = high = 0
+    for entry in index.values():
+        lo, hi, n = entry.get("min"), entry.get("max"), entry.get("prompts", 0)
+        if not n or not hi:
+            continue
+        if (since and hi <= since) or (until and lo and lo > until):
+            continue
+        high += n
+        if (not since or (lo and lo > since)) and (not until or hi <= until):
+            low += n
+    return low, high
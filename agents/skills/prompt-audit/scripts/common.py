@@ -3,6 +3,7 @@ frontmatter parser, and JSON I/O. Stdlib only, so the skill needs no install."""
 from __future__ import annotations
 
 import json
+import mmap
 import os
 from pathlib import Path
 from typing import Iterator
@@ -41,24 +42,116 @@ def watermark_path() -> Path:
     return state_dir() / "watermark.json"
 
 
+def cursors_path() -> Path:
+    return state_dir() / "cursors.json"
+
+
+def index_path() -> Path:
+    return state_dir() / "index.json"
+
+
 def projects_root() -> Path:
     return Path.home() / ".claude" / "projects"
 
 
-def iter_events(root: Path) -> Iterator[dict]:
-    for path in sorted(root.rglob("*.jsonl")):
-        try:
-            with path.open(encoding="utf-8", errors="replace") as fh:
-                for line in fh:
-                    line = line.strip()
-                    if not line:
-                        continue
+def _resume_offset(fh, st, cursor) -> int:
+    """Where to resume a transcript: the recorded offset if the file is the
+    same one we read last time and has only grown, else 0 (rescan in full)."""
+    if not cursor or cursor.get("inode") != st.st_ino:
+        return 0
+    offset = cursor.get("offset", 0)
+    if not isinstance(offset, int) or offset <= 0 or st.st_size < offset:
+        return 0
+    # We only ever stop after a newline or a complete (unterminated) object,
+    # so a rewrite that kept the inode and grew past our offset almost always
+    # breaks this.
+    fh.seek(offset - 1)
+    return offset if fh.read(1) in (b"\n", b"}") else 0
+
+
+def resume_offset(path: Path, cursor: dict | None) -> int:
+    try:
+        with path.open("rb") as fh:
+            return _resume_offset(fh, os.fstat(fh.fileno()), cursor)
+    except OSError:
+        return 0
+
+
+def transcript_paths(root: Path) -> list[Path]:
+    return sorted(root.rglob("*.jsonl"))
+
+
+def _read_lines(fh, offset):
+    for raw in fh:
+        offset += len(raw)
+        yield raw, offset, raw.endswith(b"\n")
+
+
+def _mmap_lines(fh, offset, size, prefilter):
+    """Split a memory-mapped transcript on newlines, copying out only the lines
+    the prefilter matches; the rest come back as None without leaving the map."""
+    if size <= offset:
+        return
+    with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        find, search = mm.find, prefilter.search
+        while offset < size:
+            nl = find(b"\n", offset)
+            end = size if nl == -1 else nl + 1
+            raw = mm[offset:end] if search(mm, offset, end) else None
+            offset = end
+            yield raw, end, nl != -1
+
+
+def iter_file_events(path: Path, cursors: dict | None = None,
+                     start: int | None = None, prefilter=None) -> Iterator[dict]:
+    """Yield the events of one transcript. With a cursor store, resume at the
+    recorded byte offset (or at `start`, when given) and record the new one
+    once the file is exhausted. An unterminated last line that doesn't parse is
+    left for the next run.
+
+    `prefilter` (a compiled bytes pattern) switches to the mmap scanner: lines
+    whose raw bytes don't match it are skipped without being decoded."""
+    key = str(path)
+    try:
+        with path.open("rb") as fh:
+            st = os.fstat(fh.fileno())
+            if start is not None:
+                offset = start
+            else:
+                offset = _resume_offset(fh, st, cursors.get(key)) if cursors is not None else 0
+            if prefilter is not None:
+                lines = _mmap_lines(fh, offset, st.st_size, prefilter)
+            else:
+                fh.seek(offset)
+                lines = _read_lines(fh, offset)
+            for raw, end, terminated in lines:
+                if raw is None:
+                    if not terminated:
+                        break
+                    offset = end
+                    continue
+                line = raw.decode("utf-8", errors="replace").strip()
+                if line:
                     try:
-                        yield json.loads(line)
+                        event = json.loads(line)
                     except json.JSONDecodeError:
+                        if not terminated:
+                            break
+                        offset = end
                         continue
-        except OSError:
-            continue
+                    offset = end
+                    yield event
+                else:
+                    offset = end
+    except (OSError, ValueError):   # ValueError: mmap of a file emptied under us
+        return
+    if cursors is not None:
+        cursors[key] = {"inode": st.st_ino, "size": st.st_size, "offset": offset}
+
+
+def iter_events(root: Path, cursors: dict | None = None) -> Iterator[dict]:
+    for path in transcript_paths(root):
+        yield from iter_file_events(path, cursors)
 
 
 def _unquote(s: str) -> str:
@@ -121,6 +214,6 @@ def read_json(path: Path, default=None):
         return default
 
 
-def write_json(path: Path, obj) -> None:
+def write_json(path: Path, obj, indent=1) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, indent=1), encoding="utf-8")
+    path.write_text(json.dumps(obj, indent=indent), encoding="utf-8")
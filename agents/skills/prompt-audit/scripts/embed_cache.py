@@ -0,0 +1,118 @@
+"""Content-addressed embedding cache under the state dir, keyed by (embedding
+model, storage format, hash of the whitespace-normalized text). Vectors are
+encoded by a quantize.Codec (float32 by default, float16 or int8, optionally
+projected) into one append-only binary file; a JSON index maps each key to
+its offset, length in bytes and the run it was last used in. When the file
+outgrows its budget, the least recently used vectors are dropped and the
+survivors rewritten to a new file. Stdlib only."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import common
+import quantize
+import seen
+
+MAX_BYTES = 256 * 2**20
+
+
+def cache_dir() -> Path:
+    return common.state_dir() / "embeddings"
+
+
+class EmbeddingCache:
+    def __init__(self, directory: Path | None = None, max_bytes: int = MAX_BYTES,
+                 codec: quantize.Codec | None = None):
+        self.dir = Path(directory) if directory else cache_dir()
+        self.max_bytes = max_bytes
+        self.codec = codec or quantize.Codec()
+        meta = common.read_json(self.dir / "index.json", {}) or {}
+        self.file = meta.get("file") or "vectors-0.bin"
+        self.entries: dict = meta.get("entries") or {}   # key -> [offset, bytes, last used]
+        self.run = meta.get("run", 0) + 1
+        self.pending: dict = {}
+        self.hits = self.misses = 0
+
+    def key(self, model, text):
+        return f"{model}/{self.codec.tag}:{seen.key(text)}"
+
+    def covers(self, model, texts):
+        """True if every text is cached, so embedding needs no server."""
+        keys = (self.key(model, t) for t in texts)
+        return all(k in self.entries or k in self.pending for k in keys)
+
+    def get_many(self, model, texts):
+        """Cached vectors for `texts`, None where missing; counts hits and misses."""
+        out = [None] * len(texts)
+        try:
+            fh = (self.dir / self.file).open("rb")
+        except OSError:
+            fh = None
+        try:
+            size = fh.seek(0, 2) if fh else 0
+            for i, t in enumerate(texts):
+                k = self.key(model, t)
+                vec = self.pending[k][1] if k in self.pending else None
+                entry = self.entries.get(k)
+                if vec is None and entry and fh and entry[0] + entry[1] <= size:
+                    fh.seek(entry[0])
+                    vec = self.codec.decode(fh.read(entry[1]))
+                    entry[2] = self.run
+                if vec is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    out[i] = vec
+        finally:
+            if fh:
+                fh.close()
+        return out
+
+    def put(self, model, text, vec):
+        """Queue a vector for the next save; returns it as stored, decoded
+        (float32, or a QVec for int8), so this run clusters what later runs
+        will read back."""
+        data = self.codec.encode(vec)
+        stored = self.codec.decode(data)
+        self.pending[self.key(model, text)] = (data, stored)
+        return stored
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.dir / self.file
+        if self.pending:
+            with path.open("ab") as fh:
+                for k, (data, _) in self.pending.items():
+                    self.entries[k] = [fh.tell(), len(data), self.run]
+                    fh.write(data)
+            self.pending = {}
+        old = None
+        if path.exists() and path.stat().st_size > self.max_bytes:
+            old, path = path, self._compact(path)
+            self.file = path.name
+        common.write_json(self.dir / "index.json",
+                          {"file": path.name, "run": self.run, "entries": self.entries})
+        # Only drop the old file once the index no longer points into it.
+        if old:
+            old.unlink(missing_ok=True)
+
+    def _compact(self, path):
+        """Rewrite the most recently used vectors, up to 3/4 of the budget so
+        the next few runs can append without compacting again, into a new file."""
+        budget, kept = self.max_bytes * 3 // 4, {}
+        gen = path.stem.rpartition("-")[2]
+        new = self.dir / f"vectors-{int(gen) + 1 if gen.isdigit() else 1}.bin"
+        with path.open("rb") as src, new.open("wb") as dst:
+            for k, (offset, length, used) in sorted(self.entries.items(), key=lambda kv: -kv[1][2]):
+                if dst.tell() + length > budget:
+                    break
+                src.seek(offset)
+                data = src.read(length)
+                if len(data) == length:
+                    kept[k] = [dst.tell(), length, used]
+                    dst.write(data)
+        self.entries = kept
+        return new
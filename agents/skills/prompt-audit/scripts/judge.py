@@ -1,30 +1,93 @@
 """The single bounded paid pass: send a capped set of prompts to `claude -p`
-for judgment against the applicable judgment rubric. One call per run. Stdlib
-only. Fail-open: any failure returns an empty result, never raises."""
+for judgment against the applicable judgment rubric, only for prompts without
+a cached judgment under the same guidance and judge model. One call per run,
+or with several workers, concurrent calls over small shards of the prompts
+under one deadline, keeping whichever shards finish. In streaming mode each
+judgment is parsed, and appended to a partial-results file, as soon as its
+object completes. Stdlib only. Fail-open: any failure returns an empty
+result, never raises; a malformed judgment loses only itself."""
 from __future__ import annotations
 
+import datetime as dt
+import hashlib
 import json
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import common
+import seen
 
 JUDGE_MODEL = "claude-haiku-4-5"
+JUDGE_TIMEOUT = 120.0
+JUDGE_WORKERS = 1
+JUDGE_SHARD = 5
+JUDGE_BUDGET = 24_000   # estimated tokens per judge prompt
+ITEM_TOKENS = 1_000     # per pasted prompt, before head/tail truncation
+MAX_JUDGMENTS = 5000
 
 
-def select_items(prompts, clusters, rule_findings, cap=20):
-    order, seen = [], set()
+def select_items(prompts, clusters, rule_findings, cap=20, cached=None):
+    """Cluster representatives, largest cluster first, then the prompts with
+    the most rule findings, up to `cap`. With `cached` (index -> bool),
+    cached prompts don't count against the cap, so it is filled with
+    uncached ones; up to `cap` cached ones come along for free."""
+    candidates, taken = [], set()
     for c in sorted(clusters, key=lambda c: -c["size"]):
         idx = c["representative"]
-        if idx not in seen:
-            seen.add(idx)
-            order.append(idx)
+        if idx not in taken:
+            taken.add(idx)
+            candidates.append(idx)
     worst = sorted(range(len(prompts)), key=lambda i: -len(rule_findings.get(i, [])))
     for i in worst:
-        if rule_findings.get(i) and i not in seen:
-            seen.add(i)
+        if rule_findings.get(i) and i not in taken:
+            taken.add(i)
+            candidates.append(i)
+    if cached is None:
+        return candidates[:cap]
+    order, fresh, hits = [], 0, 0
+    for i in candidates:
+        if cached(i):
+            if hits < cap:
+                hits += 1
+                order.append(i)
+        elif fresh < cap:
+            fresh += 1
             order.append(i)
-    return order[:cap]
+        if fresh == cap and hits == cap:
+            break
+    return order
+
+
+def estimate_tokens(text):
+    """About four characters a token: close enough to budget by."""
+    return (len(text) + 3) // 4
+
 
+def truncate(text, tokens=ITEM_TOKENS):
+    """`text` cut to about `tokens`, keeping its head and tail (where the ask
+    and the pasted error usually are) around a marker; returns it and how
+    many characters were cut."""
+    keep = tokens * 4
+    if len(text) <= keep:
+        return text, 0
+    head = keep * 2 // 3
+    cut = len(text) - keep
+    return f"{text[:head]}\n[… {cut} characters truncated …]\n{text[len(text) - (keep - head):]}", cut
+
+
+def _guidance(indices, prompts, judgment_by_model):
+    """Each guidance body once, with the models it applies to."""
+    owners: dict = {}
+    for m in sorted({prompts[i].get("model") for i in indices} - {None}):
+        for f in judgment_by_model.get(m, []):
+            owners.setdefault(f.body, []).append(m)
+    return owners
 
-def build_prompt(indices, prompts, judgment_by_model):
+
+def build_prompt(indices, prompts, judgment_by_model, item_tokens=ITEM_TOKENS):
     lines = [
         "You are auditing a user's prompts to an AI coding agent.",
         "Judge each prompt against the applicable guidance below.",
@@ -32,27 +95,94 @@ def build_prompt(indices, prompts, judgment_by_model):
         'index (int), violations (array of short strings), rewrite (improved prompt string).',
         "",
     ]
-    for m in sorted({prompts[i].get("model") for i in indices} - {None}):
-        bodies = [f.body for f in judgment_by_model.get(m, [])]
-        if bodies:
-            lines.append(f"## Guidance for {m}")
-            lines.extend(bodies)
-            lines.append("")
+    heading = None
+    for body, models in _guidance(indices, prompts, judgment_by_model).items():
+        if heading != f"## Guidance for {', '.join(models)}":
+            if heading:
+                lines.append("")
+            heading = f"## Guidance for {', '.join(models)}"
+            lines.append(heading)
+        lines.append(body)
+    if heading:
+        lines.append("")
     lines.append("## Prompts")
     for i in indices:
         p = prompts[i]
         lines.append(f"### index {i} (model: {p.get('model')})")
-        lines.append(p["text"])
+        lines.append(truncate(p["text"], item_tokens)[0])
         lines.append("")
     return "\n".join(lines)
 
 
-def run_claude(prompt_text, model=JUDGE_MODEL):
+def pack(indices, prompts, judgment_by_model, budget=JUDGE_BUDGET, item_tokens=ITEM_TOKENS):
+    """The items of `indices`, in priority order, that fit a judge prompt of
+    about `budget` tokens: each costs its (truncated) text plus whatever
+    guidance it adds. An item that doesn't fit is left out and smaller
+    later ones are still tried. Returns them and packing stats."""
+    used = estimate_tokens(build_prompt([], prompts, judgment_by_model))
+    kept, bodies, stats = [], set(), {"dropped": 0, "truncated": 0, "truncated_tokens": 0}
+    for i in indices:
+        text, cut = truncate(prompts[i]["text"], item_tokens)
+        new = {f.body for f in judgment_by_model.get(prompts[i].get("model"), [])} - bodies
+        cost = (estimate_tokens(f"### index {i} (model: {prompts[i].get('model')})\n{text}\n\n")
+                + sum(estimate_tokens(b) + 1 for b in new) + (10 if new else 0))
+        if used + cost > budget:
+            stats["dropped"] += 1
+            continue
+        used += cost
+        bodies |= new
+        kept.append(i)
+        if cut:
+            stats["truncated"] += 1
+            stats["truncated_tokens"] += (cut + 3) // 4
+    return kept, {"sent": len(kept), "tokens": used, **stats}
+
+
+class ObjectScanner:
+    """Top-level JSON objects in text fed in arbitrary chunks, each parsed as
+    soon as its closing brace arrives. Text between objects (the array's
+    brackets and commas, any prose) is skipped; an object that doesn't parse
+    is counted in `bad` and dropped."""
+
+    def __init__(self):
+        self.buf, self.depth, self.in_str, self.esc = [], 0, False, False
+        self.bad = 0
+
+    def feed(self, text):
+        out = []
+        for ch in text:
+            if not self.depth:
+                if ch == "{":
+                    self.buf, self.depth = ["{"], 1
+                continue
+            self.buf.append(ch)
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if not self.depth:
+                    try:
+                        out.append(json.loads("".join(self.buf)))
+                    except json.JSONDecodeError:
+                        self.bad += 1
+        return out
+
+
+def run_claude(prompt_text, model=JUDGE_MODEL, timeout=JUDGE_TIMEOUT):
     try:
         proc = subprocess.run(
             ["claude", "-p", "--model", model, "--output-format", "json"],
             input=prompt_text, capture_output=True, text=True, check=True,
-            timeout=120,
+            timeout=timeout,
         )
     except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError, OSError):
         return None
@@ -74,12 +204,190 @@ def parse_result(stdout):
         return None
     try:
         return json.loads(text[start:end + 1])
-    except json.JSONDecodeError:
+    except json.JSONDecodeError:   # salvage the objects that do parse
+        return ObjectScanner().feed(text[start:]) or None
+
+
+def _stream_text(event):
+    """(source, text) for an event of `--output-format stream-json`: a text
+    delta, a whole assistant message, or the final result."""
+    if not isinstance(event, dict):
+        return None, None
+    if event.get("type") == "stream_event":
+        delta = (event.get("event") or {}).get("delta") or {}
+        return ("delta", delta.get("text")) if delta.get("type") == "text_delta" else (None, None)
+    if event.get("type") == "assistant":
+        blocks = (event.get("message") or {}).get("content") or []
+        return "assistant", "".join(b.get("text", "") for b in blocks
+                                    if isinstance(b, dict) and b.get("type") == "text")
+    if event.get("type") == "result":
+        return "result", event.get("result")
+    return None, None
+
+
+def _write_stdin(proc, text):
+    try:
+        proc.stdin.write(text)
+        proc.stdin.close()
+    except OSError:
+        pass
+
+
+def run_claude_stream(prompt_text, model=JUDGE_MODEL, timeout=JUDGE_TIMEOUT, on_result=None):
+    """Judgments from `claude -p` streaming JSON, read line by line and
+    handed to `on_result` as each object completes. The same text arrives as
+    deltas, then as the whole message, then as the result, so only the first
+    kind seen is read. Killed at `timeout`, keeping what arrived; None if the
+    CLI couldn't be started."""
+    try:
+        proc = subprocess.Popen(
+            ["claude", "-p", "--model", model, "--output-format", "stream-json",
+             "--verbose", "--include-partial-messages"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except OSError:
         return None
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    threading.Thread(target=_write_stdin, args=(proc, prompt_text), daemon=True).start()
+    scanner, results, kind = ObjectScanner(), [], None
+    try:
+        for line in proc.stdout:
+            try:
+                source, text = _stream_text(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(text, str) or kind not in (None, source):
+                continue
+            kind = source
+            for obj in scanner.feed(text):
+                results.append(obj)
+                if on_result:
+                    on_result(obj)
+    finally:
+        timer.cancel()
+        proc.kill()
+        proc.stdout.close()
+        proc.wait()
+    return results
+
+
+def partial_path() -> Path:
+    return common.state_dir() / "judge-partial.jsonl"
+
+
+class PartialResults:
+    """Judgments appended to a JSON-lines file as they arrive, so an
+    interrupted streaming pass leaves what it had. Safe across shards."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or partial_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text("", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def __call__(self, result):
+        with self.lock, self.path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(result) + "\n")
+
+
+def cache_path() -> Path:
+    return common.state_dir() / "judgments.json"
+
+
+def cache_key(prompt, judgment_by_model, model=JUDGE_MODEL):
+    """(judge model, the guidance the prompt is judged against, its text):
+    a judgment stays valid until one of them changes."""
+    bodies = "\0".join(f.body for f in judgment_by_model.get(prompt.get("model"), []))
+    guidance = hashlib.blake2b(bodies.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{model}:{guidance}:{seen.key(prompt['text'])}"
+
 
+def load_cache(path: Path | None = None) -> dict:
+    return common.read_json(path or cache_path(), {}) or {}
 
-def judge(indices, prompts, judgment_by_model, model=JUDGE_MODEL):
+
+def save_cache(cache: dict, path: Path | None = None) -> None:
+    """Keep the MAX_JUDGMENTS most recently used judgments."""
+    recent = sorted(cache.items(), key=lambda kv: kv[1].get("used", ""), reverse=True)
+    common.write_json(path or cache_path(), dict(recent[:MAX_JUDGMENTS]))
+
+
+def _call(part, prompts, judgment_by_model, model, timeout, stream=False, partial=None):
+    """One `claude -p` call judging `part`; only judgments for its own
+    prompts count, and only those reach `partial`."""
+    def ours(r):
+        return isinstance(r, dict) and r.get("index") in part
+
+    def sink(r):
+        if ours(r):
+            partial(r)
+
+    text = build_prompt(part, prompts, judgment_by_model)
+    if stream:
+        results = run_claude_stream(text, model=model, timeout=timeout,
+                                    on_result=sink if partial else None)
+    else:
+        results = parse_result(run_claude(text, model=model, timeout=timeout))
+    return [r for r in results or [] if ours(r)]
+
+
+def _judge_sharded(indices, prompts, judgment_by_model, model, workers, deadline,
+                   stream=False, partial=None):
+    """Shards of JUDGE_SHARD prompts, `workers` `claude -p` calls at a time.
+    Each call gets what is left of the shared deadline; shards not started
+    by then are dropped."""
+    end = time.monotonic() + deadline
+    shards = [indices[k:k + JUDGE_SHARD] for k in range(0, len(indices), JUDGE_SHARD)]
+
+    def one(part):
+        left = end - time.monotonic()
+        if left <= 0:
+            return []
+        return _call(part, prompts, judgment_by_model, model, left, stream, partial)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [r for results in pool.map(one, shards) for r in results]
+
+
+def judge(indices, prompts, judgment_by_model, model=JUDGE_MODEL, cache=None,
+          workers=JUDGE_WORKERS, deadline=JUDGE_TIMEOUT, budget=JUDGE_BUDGET, packing=None,
+          stream=False, partial=None):
+    """Judgments for `indices`, in order. With `cache` (from load_cache),
+    cached judgments are reused and marked "cached"; only the rest are sent,
+    and their judgments are added to the cache. Of those, only what `pack`
+    fits in `budget` tokens is sent; `packing`, a dict, is filled in with
+    its stats. With `workers` > 1 the packed prompts are judged in
+    concurrent shards (_judge_sharded), each well under the budget. With
+    `stream`, output is read as it arrives (run_claude_stream) and each
+    judgment handed to `partial` (e.g. PartialResults) straight away."""
     if not indices:
         return []
-    result = parse_result(run_claude(build_prompt(indices, prompts, judgment_by_model), model=model))
-    return result if result is not None else []
+    if cache is None:
+        indices, stats = pack(indices, prompts, judgment_by_model, budget)
+        if packing is not None:
+            packing.update(stats)
+        if not indices:
+            return []
+        if workers > 1:
+            return _judge_sharded(indices, prompts, judgment_by_model, model, workers, deadline,
+                                  stream, partial)
+        return _call(indices, prompts, judgment_by_model, model, deadline, stream, partial)
+    today = dt.date.today().isoformat()
+    keys = {i: cache_key(prompts[i], judgment_by_model, model) for i in indices}
+    results = {}
+    for i in indices:
+        if keys[i] in cache:
+            cache[keys[i]]["used"] = today
+            results[i] = {"index": i, "violations": cache[keys[i]].get("violations", []),
+                          "rewrite": cache[keys[i]].get("rewrite"), "cached": True}
+    for r in judge([i for i in indices if i not in results], prompts, judgment_by_model, model,
+                   workers=workers, deadline=deadline, budget=budget, packing=packing,
+                   stream=stream, partial=partial):
+        i = r.get("index") if isinstance(r, dict) else None
+        if isinstance(i, int) and i in keys and i not in results:
+            results[i] = r
+            cache[keys[i]] = {"violations": r.get("violations", []), "rewrite": r.get("rewrite"),
+                              "used": today}
+    return [results[i] for i in indices if i in results]
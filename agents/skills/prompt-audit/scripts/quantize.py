@@ -0,0 +1,118 @@
+"""Compact embedding formats: float32, float16, or int8 with a per-vector
+scale, optionally after a seeded sparse random projection to fewer
+dimensions. Vectors are normalized before quantizing (cosine is all
+clustering needs), so similarity is a dot product. QVec.dot compares int8
+vectors on their integer components; the clustering loops widen them to
+floats one vector at a time, which CPython multiplies faster. Stdlib only."""
+from __future__ import annotations
+
+import math
+import operator
+import random
+import struct
+from array import array
+
+FORMATS = ("f32", "f16", "i8")
+
+
+class QVec:
+    """int8 components and the scale mapping them back: x[i] ≈ q[i] * scale.
+    Iterates as floats, so code written for float vectors still works."""
+
+    __slots__ = ("q", "scale")
+
+    def __init__(self, q, scale):
+        self.q, self.scale = q, scale
+
+    def __len__(self):
+        return len(self.q)
+
+    def __iter__(self):
+        s = self.scale
+        return (x * s for x in self.q)
+
+    def __eq__(self, other):
+        return isinstance(other, QVec) and (self.q, self.scale) == (other.q, other.scale)
+
+    __hash__ = None
+
+    def dot(self, other):
+        return sum(map(operator.mul, self.q, other.q)) * self.scale * other.scale
+
+    def to_float(self):
+        return array("f", self)
+
+
+def _unit(vec):
+    norm = math.sqrt(sum(x * x for x in vec))
+    return [x / norm for x in vec] if norm else list(vec)
+
+
+class Projection:
+    """Very sparse random projection (Li, Hastie & Church): each output is
+    a sum of about sqrt(n) randomly chosen inputs, each with an independent
+    random sign. Seeded, so the same inputs always land in the same space."""
+
+    def __init__(self, dim_in, dim_out, seed=0):
+        rng = random.Random(seed)
+        k = max(1, round(math.sqrt(dim_in)))
+        self.dim_in, self.dim_out = dim_in, dim_out
+        self.rows = []
+        for _ in range(dim_out):
+            plus, minus = [], []
+            for i in rng.sample(range(dim_in), min(k, dim_in)):
+                (plus if rng.random() < 0.5 else minus).append(i)
+            self.rows.append((plus, minus))
+
+    def __call__(self, vec):
+        get = vec.__getitem__
+        return [sum(map(get, plus)) - sum(map(get, minus)) for plus, minus in self.rows]
+
+
+class Codec:
+    """How embeddings are stored and compared: `fmt` is one of FORMATS,
+    `dim` an optional projected dimension."""
+
+    def __init__(self, fmt="f32", dim=None, seed=0):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown embedding format {fmt!r}")
+        self.fmt, self.dim, self.seed = fmt, dim, seed
+        self._projection = None
+
+    @property
+    def tag(self):
+        """Names the stored representation: entries under one tag compare."""
+        return self.fmt + (f"-p{self.dim}s{self.seed}" if self.dim else "")
+
+    def space(self, model):
+        """The vector space centroids live in: the model, after projection."""
+        return model + (f"-p{self.dim}s{self.seed}" if self.dim else "")
+
+    def _project(self, vec):
+        if not self.dim or len(vec) <= self.dim:
+            return vec
+        if self._projection is None or self._projection.dim_in != len(vec):
+            self._projection = Projection(len(vec), self.dim, self.seed)
+        return self._projection(vec)
+
+    def encode(self, vec) -> bytes:
+        vec = self._project(list(vec))
+        if self.fmt == "f32":
+            return array("f", vec).tobytes()
+        unit = _unit(vec)
+        if self.fmt == "f16":
+            return struct.pack(f"{len(unit)}e", *unit)
+        top = max(map(abs, unit), default=0.0)
+        scale = top / 127 or 1.0
+        return struct.pack("f", scale) + array("b", [round(x / scale) for x in unit]).tobytes()
+
+    def decode(self, data: bytes):
+        if self.fmt == "f32":
+            vec = array("f")
+            vec.frombytes(data)
+            return vec
+        if self.fmt == "f16":
+            return array("f", struct.unpack(f"{len(data) // 2}e", data))
+        q = array("b")
+        q.frombytes(data[4:])
+        return QVec(q, struct.unpack("f", data[:4])[0])
@@ -8,18 +8,41 @@ from collections import Counter
 import common
 
 
-def summarize(prompts, rule_findings, clusters, cluster_method):
-    counts = Counter()
-    for findings in rule_findings.values():
+def summarize(prompts, rule_findings, clusters, cluster_method, counts=None, repeats=0,
+              embed_cache=None, themes=None, sweep=None, judge_packing=None):
+    """`counts`, when given, is how many times each (unique) prompt was typed;
+    totals are weighted by it. `embed_cache` is the embedding cache's
+    hit/miss counts, if one was used; `themes`, the persisted themes this run
+    grew (themes.ThemeStore.growth); `sweep`, clusterings of the unique
+    prompts by threshold (cluster.threshold_sweep); `judge_packing`, how the
+    judge prompt was packed into its token budget (judge.pack)."""
+    weight = counts or [1] * len(prompts)
+    checks = Counter()
+    for i, findings in rule_findings.items():
         for f in findings:
-            counts[f["check"]] += 1
-    return {
-        "prompts": len(prompts),
+            checks[f["check"]] += weight[i]
+    summary = {
+        "prompts": sum(weight),
         "clusters": len(clusters),
         "cluster_method": cluster_method,
-        "check_counts": dict(counts),
-        "flagged": sum(1 for f in rule_findings.values() if f),
+        "check_counts": dict(checks),
+        "flagged": sum(weight[i] for i, f in rule_findings.items() if f),
+        "repeats": repeats,
     }
+    if embed_cache is not None:
+        summary["embedding_cache"] = embed_cache
+    if themes is not None:
+        summary["themes"] = themes
+    if judge_packing:
+        summary["judge_packing"] = judge_packing
+    if sweep:
+        summary["sweep"] = []
+        for t in sorted(sweep, reverse=True):
+            sized = sorted(((sum(weight[m] for m in c["members"]), c["representative"]) for c in sweep[t]),
+                           key=lambda sr: -sr[0])
+            summary["sweep"].append({"threshold": t, "clusters": len(sized),
+                                     "top": [[n, prompts[r]["text"][:60]] for n, r in sized[:3]]})
+    return summary
 
 
 def _trend_line(current, previous):
@@ -35,7 +58,11 @@ def render(summary, clusters, prompts, judge_results, previous):
          f"_Generated {dt.date.today().isoformat()} · {summary['prompts']} new prompts · "
          f"clustering: {summary['cluster_method']}_", "",
          "## Trend", _trend_line(summary, previous), "",
-         "## Deterministic checks", ""]
+         f"Repeat prompts: {summary.get('repeats', 0)} (exact repeats of a prompt seen before)", ""]
+    if summary.get("embedding_cache"):
+        ec = summary["embedding_cache"]
+        L += [f"Embedding cache: {ec['hits']} hits, {ec['misses']} misses", ""]
+    L += ["## Deterministic checks", ""]
     if summary["check_counts"]:
         L += ["| Check | Hits |", "|---|---:|"]
         L += [f"| {k} | {v} |" for k, v in sorted(summary["check_counts"].items(), key=lambda kv: -kv[1])]
@@ -44,16 +71,41 @@ def render(summary, clusters, prompts, judge_results, previous):
     L += ["", "## Theme clusters (top 10)", ""]
     for c in sorted(clusters, key=lambda c: -c["size"])[:10]:
         rep = prompts[c["representative"]]["text"].replace("\n", " ")[:100]
-        L.append(f"- **{c['size']}×** {rep}")
+        note = " · new theme" if c.get("new_theme") else (
+            f" · {c['total']}× all time" if "total" in c else "")
+        if c.get("keywords"):
+            note += f" — _{', '.join(c['keywords'])}_"
+        L.append(f"- **{c['size']}×** {rep}{note}")
+    if summary.get("themes"):
+        L += ["", "## Theme growth", "", "| Theme | This run | All time | Recent runs |",
+              "|---|---:|---:|---|"]
+        for t in summary["themes"]:
+            rep = t["representative"].replace("\n", " ").replace("|", "\\|")[:60]
+            L.append(f"| {rep} | +{t['added']} | {t['total']} | "
+                     f"{' → '.join(str(n) for n in t['history'])} |")
+    if summary.get("sweep"):
+        L += ["", "## Threshold sweep", "", "| Threshold | Clusters | Largest themes |", "|---:|---:|---|"]
+        for row in summary["sweep"]:
+            top = "; ".join(f"{n}× {text}".replace("\n", " ").replace("|", "\\|") for n, text in row["top"])
+            L.append(f"| {row['threshold']:.2f} | {row['clusters']} | {top} |")
     L += ["", "## Judgment (sampled)", ""]
+    jp = summary.get("judge_packing")
+    if jp and (jp["truncated"] or jp["dropped"]):
+        L += [f"_Judge prompt: ~{jp['tokens']:,} tokens; {jp['truncated']} of {jp['sent']} prompts "
+              f"truncated (~{jp['truncated_tokens']:,} tokens cut), {jp['dropped']} left out "
+              f"over budget._", ""]
     if judge_results:
+        flags = [bool(r.get("cached")) for r in judge_results if isinstance(r, dict)]
+        if any(flags):
+            L += [f"_{flags.count(False)} judged this run, {flags.count(True)} from earlier runs._", ""]
         for r in judge_results:
             if not isinstance(r, dict):
                 continue
             i = r.get("index")
             if not isinstance(i, int) or i < 0 or i >= len(prompts):
                 continue
-            L.append(f"- _{prompts[i]['text'].replace(chr(10), ' ')[:100]}_")
+            note = " · cached" if r.get("cached") else ""
+            L.append(f"- _{prompts[i]['text'].replace(chr(10), ' ')[:100]}_{note}")
             L += [f"  - ⚠ {v}" for v in r.get("violations", [])]
             if r.get("rewrite"):
                 L.append(f"  - ✎ {r['rewrite']}")
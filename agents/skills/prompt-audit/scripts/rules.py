@@ -1,9 +1,17 @@
 """Deterministic, $0 checks over prompt text. The logic is built in; the
-parameters (word budget, banned words, which checks to enable) come from
-deterministic criteria files. Stdlib only."""
+parameters (word budget, banned words, which checks to enable, extra named
+regex checks) come from deterministic criteria files. Stdlib only."""
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
 import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import common
+import rubric
 
 
 def check_max_words(text, params):
@@ -14,16 +22,57 @@ def check_max_words(text, params):
     return f"{n} words > {limit}" if n > limit else None
 
 
+_TOKEN = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=32)
+def compile_banned(words):
+    r"""Compile a banned-word list once. `\bword\b` for an all-word-character
+    word matches exactly when the word is one of the text's maximal \w+ runs,
+    so those become a set lookup against the text's tokens; phrases and words
+    with punctuation keep a pattern, plus one alternation over all of them to
+    answer "any hit?" in a single scan. Evidence keeps list order and
+    overlapping entries (york / new york) are all reported."""
+    low = [str(w).lower() for w in words]
+    singles: dict = {}
+    for i, w in enumerate(low):
+        if _TOKEN.fullmatch(w):
+            singles.setdefault(w, []).append(i)
+    others = [(i, w) for i, w in enumerate(low) if w not in singles]
+    alts = sorted({re.escape(w) for _, w in others}, key=len, reverse=True)
+    phrases = re.compile(r"\b(?:" + "|".join(alts) + r")\b") if alts else None
+    each = tuple((i, re.compile(r"\b" + re.escape(w) + r"\b")) for i, w in others)
+    return singles, phrases, each, tuple(words)
+
+
+def banned_hits(low, compiled):
+    singles, phrases, each, words = compiled
+    idx = []
+    if singles:
+        for tok in singles.keys() & set(_TOKEN.findall(low)):
+            idx.extend(singles[tok])
+    if phrases and phrases.search(low):
+        idx.extend(i for i, pat in each if pat.search(low))
+    return [words[i] for i in sorted(idx)]
+
+
+def _banned_evidence(hits):
+    return "banned: " + ", ".join(hits) if hits else None
+
+
 def check_banned_words(text, params):
     words = params.get("banned_words") or []
-    low = text.lower()
-    hits = [w for w in words if re.search(r"\b" + re.escape(str(w).lower()) + r"\b", low)]
-    return "banned: " + ", ".join(hits) if hits else None
+    return _banned_evidence(banned_hits(text.lower(), params.get("_banned") or compile_banned(tuple(words))))
 
 
 _LATE = re.compile(r"\binstead of\b", re.I)
+def _late_evidence(m):
+    return "late constraint ('instead of')"
+
+
 def check_late_constraint(text, params):
-    return "late constraint ('instead of')" if _LATE.search(text) else None
+    m = _LATE.search(text)
+    return _late_evidence(m) if m else None
 
 
 _PREMISE = re.compile(r"^\s*i thought\b", re.I)
@@ -32,9 +81,37 @@ def check_faulty_premise(text, params):
 
 
 _VAGUE = re.compile(r"\b(the thing|that thing|do that|fix (?:it|that|this)|like i said|as before)\b", re.I)
+def _vague_evidence(m):
+    return f"ambiguous referent ('{m.group(0)}')"
+
+
 def check_ambiguous_referent(text, params):
     m = _VAGUE.search(text)
-    return f"ambiguous referent ('{m.group(0)}')" if m else None
+    return _vague_evidence(m) if m else None
+
+
+REGEX_PREFIX = "regex_"
+
+
+def _regex_check(pattern):
+    def check(text, params):
+        m = pattern.search(text)
+        return f"matched '{m.group(0)[:60]}'" if m else None
+    return check
+
+
+@functools.lru_cache(maxsize=32)
+def compile_regex_checks(items):
+    """(name, pattern) pairs from criteria frontmatter, compiled once into
+    (name, check) pairs; matched case-insensitively. A pattern that doesn't
+    compile is skipped rather than failing the run."""
+    out = []
+    for name, pattern in items:
+        try:
+            out.append((name, _regex_check(re.compile(str(pattern), re.I))))
+        except re.error:
+            continue
+    return tuple(out)
 
 
 CHECKS = {
@@ -58,16 +135,161 @@ def merge_params(det_files):
                 enabled.add(key)
         for name in (f.meta.get("enable") or []):
             enabled.add(name)
-    return params, enabled
+        for key, pattern in f.meta.items():
+            name = key[len(REGEX_PREFIX):]
+            if key.startswith(REGEX_PREFIX) and name and name not in CHECKS:
+                params.setdefault("regex_checks", {})[name] = pattern
+                enabled.add(name)
+    return _compiled(params), enabled
+
+
+def _compiled(params):
+    """`params` with its banned words and regex checks compiled alongside."""
+    if params.get("banned_words"):
+        params["_banned"] = compile_banned(tuple(params["banned_words"]))
+    if params.get("regex_checks"):
+        params["_regex"] = compile_regex_checks(tuple(params["regex_checks"].items()))
+    return params
+
+
+def signature(params, enabled):
+    """Stable identity of a rule configuration, so cached findings are reused
+    only under the parameters that produced them."""
+    plain = {k: v for k, v in params.items() if not k.startswith("_")}
+    blob = json.dumps([plain, sorted(enabled)], sort_keys=True, default=str)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass(frozen=True)
+class RuleBundle:
+    """Everything rule evaluation needs for one model, resolved and compiled
+    once: merged params (banned words precompiled), enabled checks in table
+    order, and the signature cached findings are filed under."""
+    params: dict
+    enabled: frozenset
+    checks: tuple      # ((name, fn), ...)
+    signature: str
+
+    def apply(self, text):
+        findings = []
+        for name, fn in self.checks:
+            ev = fn(text, self.params)
+            if ev:
+                findings.append({"check": name, "evidence": ev})
+        return findings
+
+
+def compile_bundle(det_files):
+    return _bundle(*merge_params(det_files))
+
+
+def _bundle(params, enabled):
+    checks = tuple((name, fn) for name, fn in CHECKS.items() if name in enabled)
+    checks += params.get("_regex", ())
+    return RuleBundle(params=params, enabled=frozenset(enabled), checks=checks,
+                      signature=signature(params, enabled))
+
+
+def rubric_key(files):
+    """Identity of a loaded rubric set: each file's path and mtime, so an edited
+    criteria file invalidates bundles built from the old one."""
+    key = []
+    for f in files:
+        try:
+            key.append((str(f.path), f.path.stat().st_mtime_ns))
+        except OSError:
+            key.append((str(f.path), None))
+    return tuple(key)
+
+
+_BUNDLES: dict = {}
+
+
+def bundle_for_model(model, files, key=None):
+    """The model's compiled bundle, built on first use and kept for the life of
+    the process while `key` is unchanged. load_bundles/save_bundles carry
+    them from one run to the next."""
+    key = rubric_key(files) if key is None else key
+    bundle = _BUNDLES.get((key, model))
+    if bundle is None:
+        bundle = compile_bundle(rubric.resolve_for_model(model, files)["deterministic"])
+        _BUNDLES[(key, model)] = bundle
+    return bundle
+
+
+def bundles_path() -> Path:
+    return common.state_dir() / "rule-bundles.json"
+
+
+def _key_id(key):
+    return hashlib.blake2b(json.dumps(key).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def load_bundles(key, path: Path | None = None):
+    """Recompile the bundles a previous run saved under the same rubric key
+    (same files, same mtimes), so this run resolves no rubric files and
+    merges no params for those models. Returns how many were loaded."""
+    data = common.read_json(path or bundles_path(), {}) or {}
+    if data.get("key") != _key_id(key):
+        return 0
+    for b in data.get("bundles") or []:
+        _BUNDLES[(key, b["model"])] = _bundle(_compiled(dict(b["params"])), set(b["enabled"]))
+    return len(data.get("bundles") or [])
+
+
+def save_bundles(key, path: Path | None = None):
+    bundles = [{"model": model, "enabled": sorted(b.enabled),
+                "params": {k: v for k, v in b.params.items() if not k.startswith("_")}}
+               for (k, model), b in _BUNDLES.items() if k == key]
+    common.write_json(path or bundles_path(), {"key": _key_id(key), "bundles": bundles})
 
 
 def apply_to_prompt(text, params, enabled):
+    custom = dict(params.get("_regex", ()))
     findings = []
     for name in enabled:
-        fn = CHECKS.get(name)
+        fn = CHECKS.get(name) or custom.get(name)
         if not fn:
             continue
         ev = fn(text, params)
         if ev:
             findings.append({"check": name, "evidence": ev})
     return findings
+
+
+# For batch evaluation: literals, one of which any match must contain once
+# lowercased. A batch runs the pattern only on ASCII texts containing one, and
+# on every non-ASCII text, where str.lower() needn't mirror re.I's folding.
+_SCANS = {
+    "late_constraint": (_LATE, _late_evidence, ("instead of",)),
+    "ambiguous_referent": (_VAGUE, _vague_evidence,
+                           ("thing", "do that", "fix ", "like i said", "as before")),
+}
+
+
+def apply_batch(texts, bundle):
+    """Findings for many prompts at once, looping check by check across the
+    batch. Each text is lowercased once for every check that wants it, and
+    pattern checks in _SCANS skip texts without a required literal. Same
+    findings, in the same order, as bundle.apply."""
+    results = [[] for _ in texts]
+    lows = [t.lower() for t in texts]
+    params = bundle.params
+    for name, fn in bundle.checks:
+        if name in _SCANS:
+            pattern, evidence, lits = _SCANS[name]
+            evs = []
+            for t, low in zip(texts, lows):
+                m = None
+                if not t.isascii() or any(lit in low for lit in lits):
+                    m = pattern.search(t)
+                evs.append(evidence(m) if m else None)
+        elif name == "banned_words":
+            compiled = params.get("_banned") or compile_banned(tuple(params.get("banned_words") or []))
+            evs = [_banned_evidence(banned_hits(low, compiled)) for low in lows]
+        else:
+            evs = [fn(t, params) for t in texts]
+        for found, ev in zip(results, evs):
+            if ev:
+                found.append({"check": name, "evidence": ev})
+    return results
@@ -0,0 +1,77 @@
+"""Persistent store of every prompt already audited, keyed by a hash of its
+whitespace-normalized text. Each entry keeps the prompt's rule findings (per
+rule-parameter signature), how many times it was typed and when last, so
+repeats of "run the tests" cost a dict lookup instead of another trip
+through the rules. Embeddings and judgments of repeats come from their own
+caches (embed_cache, judge); clustering still places every prompt of a run,
+since clusters depend on the run's method and threshold. The store keeps the
+MAX_SEEN most recently typed prompts. Stdlib only."""
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+import common
+
+MAX_SEEN = 100_000
+MAX_SIGNATURES = 4
+
+
+def seen_path() -> Path:
+    return common.state_dir() / "seen.json"
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def key(text: str) -> str:
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def load(path: Path | None = None) -> dict:
+    return common.read_json(path or seen_path(), {}) or {}
+
+
+def save(store: dict, path: Path | None = None) -> None:
+    """Keep the MAX_SEEN most recently typed prompts, written compactly: the
+    store is rewritten in full every run."""
+    if len(store) > MAX_SEEN:
+        recent = sorted(store.items(), key=lambda kv: kv[1].get("last") or "", reverse=True)
+        store = dict(recent[:MAX_SEEN])
+    common.write_json(path or seen_path(), store, indent=None)
+
+
+def is_new(entry, timestamp) -> bool:
+    """True unless this occurrence was already counted into `entry`: one at
+    or before the newest occurrence it has seen (re-auditing a window)."""
+    return not entry or (timestamp or "") > (entry.get("last") or "")
+
+
+def cached_findings(entry, signature):
+    if not entry:
+        return None
+    return (entry.get("findings") or {}).get(signature)
+
+
+def expand_clusters(clusters, counts):
+    """Clusters over unique prompts, re-sized by how often each member was typed."""
+    return [{**c, "size": sum(counts[m] for m in c["members"])} for c in clusters]
+
+
+def record(store, keys, latest, added, findings, signatures):
+    """Fold this run into the store: `added` occurrences not counted before
+    (see is_new), the newest timestamp, and the findings under the
+    signature they were computed with, alongside those for other models'
+    signatures. A key may come more than once, once per signature. Each
+    entry keeps its MAX_SIGNATURES most recently used signatures."""
+    for i, k in enumerate(keys):
+        entry = store.setdefault(k, {})
+        entry["count"] = entry.get("count", 0) + added[i]
+        entry["last"] = max(entry.get("last") or "", latest[i] or "") or None
+        by_sig = entry.setdefault("findings", {})
+        by_sig.pop(signatures[i], None)   # re-insert: most recently used last
+        by_sig[signatures[i]] = findings.get(i, [])
+        while len(by_sig) > MAX_SIGNATURES:
+            del by_sig[next(iter(by_sig))]
+    return store
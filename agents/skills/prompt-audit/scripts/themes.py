@@ -0,0 +1,143 @@
+"""Theme store: embedding clusters kept across runs as a centroid, size,
+representative prompt and a short per-run history, so a new run joins its
+prompts to existing themes and only opens themes for prompts that fit none.
+Centroids drift as they absorb prompts; `recompact` merges themes that have
+drifted together. The store keeps at most MAX_THEMES themes. Stdlib only."""
+from __future__ import annotations
+
+import base64
+import datetime as dt
+from array import array
+from pathlib import Path
+
+import cluster
+import common
+
+HISTORY = 24
+MAX_THEMES = 2_000
+
+
+def themes_path() -> Path:
+    return common.state_dir() / "themes.json"
+
+
+def _encode(vec):
+    return base64.b64encode(array("f", vec).tobytes()).decode("ascii")
+
+
+def _decode(text):
+    vec = array("f")
+    vec.frombytes(base64.b64decode(text))
+    return vec
+
+
+def _mean(a, wa, b, wb):
+    """a·wa + b·wb, renormalized: a weighted mean direction."""
+    return cluster.normalize([(x * wa + y * wb) for x, y in zip(a, b)])
+
+
+def _merge_history(a, b):
+    runs: dict = {}
+    for label, n in a + b:
+        runs[label] = runs.get(label, 0) + n
+    return [[label, n] for label, n in sorted(runs.items())][-HISTORY:]
+
+
+def _freshness(theme):
+    """Sort key: when the theme last grew, then its size."""
+    return (theme["history"][-1][0] if theme["history"] else "", theme["size"])
+
+
+class ThemeStore:
+    def __init__(self, path: Path | None = None, model: str = cluster.EMBED_MODEL):
+        self.path = path or themes_path()
+        self.model = model
+        data = common.read_json(self.path, {}) or {}
+        if data.get("model") != model:   # centroids from another model don't compare
+            data = {}
+        self.themes: dict = data.get("themes") or {}
+        self.next_id = data.get("next_id", 1)
+        self._ids: list = []
+
+    def seeds(self):
+        """Theme centroids, oldest theme first, for greedy_cluster."""
+        self._ids = list(self.themes)
+        return [_decode(self.themes[t]["centroid"]) for t in self._ids]
+
+    def absorb(self, clusters, unit, texts, weights, label=None):
+        """Fold this run's clusters (from greedy_cluster over `seeds()`) into
+        the store, `weights` being how many occurrences of each text the
+        store hasn't counted yet (re-auditing a window adds none). Each
+        cluster gains "theme", "added", "total" (the theme's size across
+        runs) and "new_theme"; a cluster adding nothing opens no theme."""
+        label = label or dt.date.today().isoformat()
+        for c in clusters:
+            w = sum(weights[m] for m in c["members"])
+            if not w:
+                if "seed" in c:
+                    tid = self._ids[c["seed"]]
+                    c.update(theme=tid, added=0, total=self.themes[tid]["size"], new_theme=False)
+                continue
+            total = [0.0] * len(unit[c["members"][0]])
+            for m in c["members"]:
+                total = [t + x * weights[m] for t, x in zip(total, unit[m])]
+            if "seed" in c:
+                tid = self._ids[c["seed"]]
+                theme = self.themes[tid]
+                centroid = _mean(_decode(theme["centroid"]), theme["size"], total, 1.0)
+            else:
+                tid, self.next_id = f"t{self.next_id}", self.next_id + 1
+                theme = self.themes[tid] = {"size": 0, "history": [],
+                                            "representative": texts[c["representative"]][:200]}
+                centroid = cluster.normalize(total)
+            theme["centroid"] = _encode(centroid)
+            theme["size"] += w
+            theme["history"] = _merge_history(theme["history"], [[label, w]])
+            c.update(theme=tid, added=w, total=theme["size"], new_theme="seed" not in c)
+
+    def growth(self, clusters, limit=10):
+        """Rows for the report: the themes this run added most to, with their
+        recent per-run history."""
+        added: dict = {}
+        for c in clusters:
+            if "theme" in c:
+                added[c["theme"]] = added.get(c["theme"], 0) + c["added"]
+        rows = []
+        for tid, n in sorted(added.items(), key=lambda kv: -kv[1])[:limit]:
+            theme = self.themes[tid]
+            rows.append({"theme": tid, "representative": theme["representative"], "added": n,
+                         "total": theme["size"], "history": [h[1] for h in theme["history"][-6:]]})
+        return rows
+
+    def recompact(self, threshold=0.83):
+        """Merge themes whose centroids are at least `threshold` similar,
+        largest first so big themes absorb small ones. Returns how many
+        themes were merged away."""
+        ids = sorted(self.themes, key=lambda t: -self.themes[t]["size"])
+        groups = cluster.greedy_cluster([_decode(self.themes[t]["centroid"]) for t in ids],
+                                        threshold=threshold, ann=False)
+        merged = {}
+        for g in groups:
+            keep = ids[g["members"][0]]
+            theme = dict(self.themes[keep])
+            for m in g["members"][1:]:
+                other = self.themes[ids[m]]
+                theme["centroid"] = _encode(_mean(_decode(theme["centroid"]), theme["size"],
+                                                  _decode(other["centroid"]), other["size"]))
+                theme["size"] += other["size"]
+                theme["history"] = _merge_history(theme["history"], other["history"])
+            merged[keep] = theme
+        gone = len(self.themes) - len(merged)
+        # Keep ids in creation order, so seeds() stays oldest first.
+        self.themes = {t: merged[t] for t in self.themes if t in merged}
+        return gone
+
+    def save(self):
+        """Write the store, first dropping themes beyond MAX_THEMES: those that
+        have gone longest without growing, smallest first among those."""
+        if len(self.themes) > MAX_THEMES:
+            ranked = sorted(self.themes, key=lambda t: _freshness(self.themes[t]), reverse=True)
+            keep = set(ranked[:MAX_THEMES])
+            self.themes = {t: theme for t, theme in self.themes.items() if t in keep}
+        common.write_json(self.path, {"model": self.model, "next_id": self.next_id,
+                                      "themes": self.themes})
@@ -1,17 +1,19 @@
-import json, os, sys, tempfile, unittest
+import contextlib, io, json, os, sys, tempfile, unittest
 from unittest import mock
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 import audit, cluster, judge
 
-def _transcript(dirpath):
+def _transcript(dirpath, texts=("I thought it was merged",)):
     proj = Path(dirpath) / "proj"
     proj.mkdir(parents=True)
-    events = [
-        {"type": "user", "sessionId": "s", "timestamp": "2026-08-09T10:00:00Z",
-         "cwd": "/x/proj", "message": {"role": "user", "content": "I thought it was merged"}},
-        {"type": "assistant", "sessionId": "s", "message": {"role": "assistant", "model": "claude-opus-4-8"}},
-    ]
+    events = []
+    for n, text in enumerate(texts):
+        events += [
+            {"type": "user", "sessionId": "s", "timestamp": f"2026-08-09T10:00:{n:02d}Z",
+             "cwd": "/x/proj", "message": {"role": "user", "content": text}},
+            {"type": "assistant", "sessionId": "s", "message": {"role": "assistant", "model": "claude-opus-4-8"}},
+        ]
     (proj / "s.jsonl").write_text("\n".join(json.dumps(e) for e in events), encoding="utf-8")
 
 class TestAudit(unittest.TestCase):
@@ -32,6 +34,219 @@ class TestAudit(unittest.TestCase):
             finally:
                 del os.environ["XDG_STATE_HOME"]
 
+    def test_cluster_method_tfidf(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d, texts=("update the release notes", "write the release notes"))
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available") as probe, \
+                     mock.patch.object(judge, "run_claude", return_value=None), \
+                     mock.patch("report.save_run") as save_run:
+                    audit.run(["--since", "2026-08-01T00:00:00Z", "--cluster-method", "tfidf"])
+                probe.assert_not_called()
+                summary = save_run.call_args[0][0]
+                self.assertEqual((summary["cluster_method"], summary["clusters"]), ("tfidf", 1))
+                self.assertFalse((Path(state_d) / "prompt-audit" / "themes.json").exists())
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_second_run_embeds_from_cache(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d, texts=("fix the build", "run the tests"))
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=True), \
+                     mock.patch.object(cluster, "_embed_all",
+                                       side_effect=lambda texts, *a: [[1.0, len(t)] for t in texts]) as emb, \
+                     mock.patch.object(judge, "run_claude", return_value=None):
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    with mock.patch("report.save_run") as save_run:
+                        audit.run(["--since", "2026-08-01T00:00:00Z"])
+                self.assertEqual(emb.call_count, 1)
+                summary = save_run.call_args[0][0]
+                self.assertEqual(summary["cluster_method"], "embeddings")
+                self.assertEqual(summary["embedding_cache"], {"hits": 2, "misses": 0})
+                # Both prompts embed alike and went into one persisted theme; the
+                # second run covered the same window, so it added nothing.
+                self.assertEqual([(t["added"], t["total"]) for t in summary["themes"]], [(0, 2)])
+                rc = audit.run(["--recompact-themes"])
+                self.assertEqual(rc, 0)
+                # A different threshold, and a sweep, reuse the cached embeddings.
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(cluster, "_embed_all") as emb, \
+                     contextlib.redirect_stdout(io.StringIO()) as out:
+                    audit.run(["--since", "2026-08-01T00:00:00Z", "--dry-run",
+                               "--threshold", "0.99", "--thresholds", "0.999,0.5"])
+                emb.assert_not_called()
+                self.assertIn("| 0.50 | 1 | 2× fix the build |", out.getvalue())
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_judgments_cached_across_runs(self):
+        reply = json.dumps({"result": json.dumps([{"index": 0, "violations": ["vague"], "rewrite": "name it"}])})
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d)
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(judge, "run_claude", return_value=reply) as rc:
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    with contextlib.redirect_stdout(io.StringIO()) as out:
+                        audit.run(["--since", "2026-08-01T00:00:00Z", "--dry-run"])
+                    with mock.patch("report.write_report") as wr:
+                        audit.run(["--since", "2026-08-01T00:00:00Z"])
+                self.assertEqual(rc.call_count, 1)
+                self.assertIn("- _I thought it was merged_ · cached", out.getvalue())
+                self.assertIn("✎ name it", wr.call_args[0][0])
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_int8_embedding_store(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d, texts=("fix the build", "run the tests"))
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=True), \
+                     mock.patch.object(cluster, "_embed_all",
+                                       side_effect=lambda texts, *a: [[1.0, len(t), 0.5] for t in texts]), \
+                     mock.patch.object(judge, "run_claude", return_value=None), \
+                     mock.patch("report.save_run") as save_run:
+                    audit.run(["--since", "2026-08-01T00:00:00Z", "--embed-format", "i8",
+                               "--embed-dim", "2"])
+                self.assertEqual(save_run.call_args[0][0]["cluster_method"], "embeddings")
+                state = Path(state_d) / "prompt-audit"
+                self.assertEqual((state / "embeddings" / "vectors-0.bin").stat().st_size, 2 * (4 + 2))
+                themes = json.loads((state / "themes.json").read_text())
+                self.assertEqual(themes["model"], f"{cluster.EMBED_MODEL}-p2s0")
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_rerunning_a_window_does_not_recount(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d, texts=("run the tests", "run the tests"))
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(judge, "run_claude", return_value=None):
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                store = json.loads((Path(state_d) / "prompt-audit" / "seen.json").read_text())
+                self.assertEqual([(e["count"], e["last"]) for e in store.values()],
+                                 [(2, "2026-08-09T10:00:01Z")])
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_same_text_checked_against_each_models_criteria(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d, \
+             tempfile.TemporaryDirectory() as crit_d:
+            (Path(crit_d) / "sonnet.md").write_text(
+                "---\nkind: deterministic\nmodel: sonnet-x\nbanned_words: [tests]\n---\n", encoding="utf-8")
+            proj = Path(proj_d) / "proj"
+            proj.mkdir()
+            events = []
+            for n, model in enumerate(["opus-x", "sonnet-x"]):
+                events += [{"type": "user", "sessionId": "s", "timestamp": f"2026-08-09T10:00:0{n}Z",
+                            "cwd": "/x/proj", "message": {"role": "user", "content": "run the tests"}},
+                           {"type": "assistant", "sessionId": "s",
+                            "message": {"role": "assistant", "model": model}}]
+            (proj / "s.jsonl").write_text("\n".join(json.dumps(e) for e in events), encoding="utf-8")
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch("common.criteria_dir", return_value=Path(crit_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(judge, "run_claude", return_value=None), \
+                     mock.patch("report.save_run") as save_run:
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])   # now from the store
+                for call in save_run.call_args_list:
+                    summary = call[0][0]
+                    self.assertEqual((summary["check_counts"], summary["flagged"], summary["prompts"]),
+                                     ({"banned_words": 1}, 1, 2))
+                store = json.loads((Path(state_d) / "prompt-audit" / "seen.json").read_text())
+                (entry,) = store.values()
+                self.assertEqual((entry["count"], len(entry["findings"])), (2, 2))
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_resume_reads_only_appended_tail(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d)
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(judge, "run_claude", return_value=None):
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    cursors = json.loads((Path(state_d) / "prompt-audit" / "cursors.json").read_text())
+                    self.assertEqual(len(cursors), 1)
+                    with (Path(proj_d) / "proj" / "s.jsonl").open("a", encoding="utf-8") as fh:
+                        fh.write("\n" + json.dumps(
+                            {"type": "user", "sessionId": "s", "timestamp": "2026-08-10T10:00:00Z",
+                             "cwd": "/x/proj", "message": {"role": "user", "content": "next"}}) + "\n")
+                    # Without a watermark only the cursor keeps the first prompt out.
+                    (Path(state_d) / "prompt-audit" / "watermark.json").unlink()
+                    with mock.patch("report.write_report") as wr:
+                        audit.run([])
+                self.assertIn("1 new prompts", wr.call_args[0][0])
+                wm = json.loads((Path(state_d) / "prompt-audit" / "watermark.json").read_text())
+                self.assertEqual(wm["last"], "2026-08-10T10:00:00Z")
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_count_answers_from_index(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d)
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch("builtins.print") as out:
+                    rc = audit.run(["--count", "--since", "2026-08-01T00:00:00Z"])
+                self.assertEqual(rc, 0)
+                self.assertIn("1 prompts", out.call_args[0][0])
+                self.assertTrue((Path(state_d) / "prompt-audit" / "index.json").exists())
+                self.assertFalse((Path(state_d) / "prompt-audit" / "reports").exists())
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_repeats_are_deduped_and_cached(self):
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d, ["I thought it was merged", "run the tests", "run  the tests"])
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(judge, "run_claude", return_value=None), \
+                     mock.patch("report.write_report") as wr, \
+                     mock.patch("rules.apply_batch", wraps=audit.rules_mod.apply_batch) as rules:
+                    def evaluated():
+                        return sum(len(c.args[0]) for c in rules.call_args_list)
+
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    self.assertEqual(evaluated(), 2)
+                    md = wr.call_args[0][0]
+                    self.assertIn("3 new prompts", md)
+                    self.assertIn("Repeat prompts: 1", md)
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    self.assertEqual(evaluated(), 2)             # second run served from the store
+                    md = wr.call_args[0][0]
+                    self.assertIn("Repeat prompts: 0", md)    # the same occurrences, not repeats
+                    self.assertIn("faulty_premise | 1", md)
+                    with open(Path(proj_d) / "proj" / "s.jsonl", "a", encoding="utf-8") as f:
+                        f.write("\n" + json.dumps({"type": "user", "sessionId": "s",
+                                                   "timestamp": "2026-08-10T00:00:00Z", "cwd": "/x/proj",
+                                                   "message": {"role": "user", "content": "run the tests"}}))
+                    audit.run(["--since", "2026-08-01T00:00:00Z"])
+                    self.assertIn("Repeat prompts: 1", wr.call_args[0][0])
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
     def test_since_nd_cutoff_is_z_suffixed(self):
         # A relative --since Nd cutoff must be Z-suffixed to order correctly
         # against transcript timestamps, not carry a +00:00 offset (bees-woqp).
@@ -39,6 +254,26 @@ class TestAudit(unittest.TestCase):
         self.assertTrue(cutoff.endswith("Z"))
         self.assertNotIn("+00:00", cutoff)
 
+    def test_explicit_embeddings_method(self):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            audit.run(["--no-embed", "--cluster-method", "embeddings"])
+        with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
+            _transcript(proj_d)
+            os.environ["XDG_STATE_HOME"] = state_d
+            try:
+                with mock.patch("common.projects_root", return_value=Path(proj_d)), \
+                     mock.patch.object(cluster, "ollama_available", return_value=False), \
+                     mock.patch.object(judge, "run_claude", return_value=None), \
+                     contextlib.redirect_stderr(io.StringIO()) as err:
+                    rc = audit.run(["--since", "2026-08-01T00:00:00Z", "--cluster-method", "embeddings"])
+                    self.assertEqual(rc, 1)
+                    self.assertFalse((Path(state_d) / "prompt-audit" / "watermark.json").exists())
+                    audit.run(["--since", "2026-08-01T00:00:00Z", "--thresholds", "0.8"])
+                self.assertIn("can't cluster by embeddings", err.getvalue())
+                self.assertIn("--thresholds ignored: clustered by minhash", err.getvalue())
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
     def test_since_nd_and_no_embed_run(self):
         with tempfile.TemporaryDirectory() as proj_d, tempfile.TemporaryDirectory() as state_d:
             _transcript(proj_d)
@@ -1,8 +1,68 @@
-import sys, unittest
+import contextlib, functools, json, math, random, socket, sys, tempfile, threading, time, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest import mock
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
-import cluster
+import cluster, embed_cache, quantize
+
+def _vec(text):
+    return [float(len(text)), 1.0]
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, as ollama serves
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.seen.append(self.path)
+            self.server.clients.add(self.client_address)
+            failing = self.server.fail_first > 0
+            self.server.fail_first -= failing
+        time.sleep(self.server.delay)
+        if failing:
+            self.send_error(503)
+        elif self.path == "/api/embed" and self.server.batch:
+            out = {"embeddings": [_vec(t) for t in body["input"]]}
+        elif self.path == "/api/embeddings":
+            out = {"embedding": _vec(body["prompt"])}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(out).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass    # clients hanging up mid-response, e.g. past a deadline
+
+@contextlib.contextmanager
+def fake_ollama(batch=True, fail_first=0, delay=0.0, clients=None):
+    """A local stand-in for ollama's embedding API; yields its base URL and
+    the list of request paths it served. The first `fail_first` requests get
+    a 503; `clients` collects the connections' client addresses."""
+    server = _QuietServer(("127.0.0.1", 0), _FakeOllama)
+    server.batch, server.seen, server.lock = batch, [], threading.Lock()
+    server.fail_first, server.delay = fail_first, delay
+    server.clients = set() if clients is None else clients
+    t = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    t.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", server.seen
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
 
 class TestCluster(unittest.TestCase):
     def test_greedy_cluster(self):
@@ -11,10 +71,163 @@ class TestCluster(unittest.TestCase):
         sizes = sorted(c["size"] for c in cs)
         self.assertEqual(sizes, [1, 2])
 
+    def test_normalize(self):
+        v = cluster.normalize([3.0, 4.0])
+        self.assertEqual(v.typecode, "f")
+        self.assertAlmostEqual(v[0], 0.6, places=6)
+        self.assertEqual(list(cluster.normalize([0.0, 0.0])), [0.0, 0.0])
+
+    def _legacy(self, vectors, threshold):
+        def cos(a, b):
+            na, nb = math.sqrt(sum(x * x for x in a)), math.sqrt(sum(y * y for y in b))
+            return 0.0 if na == 0 or nb == 0 else sum(x * y for x, y in zip(a, b)) / (na * nb)
+        seeds = []
+        for i, v in enumerate(vectors):
+            for s in seeds:
+                if cos(v, s[1]) >= threshold:
+                    s[0].append(i)
+                    break
+            else:
+                seeds.append(([i], v))
+        return [m for m, _ in seeds]
+
+    def _vectors(self, noise=0.4):
+        rng = random.Random(7)
+        centers = [[rng.gauss(0, 1) for _ in range(32)] for _ in range(6)]
+        return [[x + rng.gauss(0, noise) for x in rng.choice(centers)] for _ in range(300)] + [[0.0] * 32]
+
+    def test_greedy_matches_plain_cosine(self):
+        vecs = self._vectors()
+        with mock.patch.object(cluster, "np", None):
+            got = [c["members"] for c in cluster.greedy_cluster(vecs, threshold=0.8)]
+        self.assertEqual(got, self._legacy(vecs, 0.8))
+
+    @unittest.skipIf(cluster.np is None, "numpy not installed")
+    def test_numpy_path_matches_python(self):
+        vecs = self._vectors()
+        fast = cluster.greedy_cluster(vecs, threshold=0.8)
+        with mock.patch.object(cluster, "np", None):
+            self.assertEqual(fast, cluster.greedy_cluster(vecs, threshold=0.8))
+
+    def test_int8_vectors_cluster_like_float(self):
+        vecs = self._vectors(noise=0.1)
+        codec = quantize.Codec("i8")
+        q = [codec.decode(codec.encode(v)) for v in vecs[:-1]]
+        with mock.patch.object(cluster, "np", None):
+            exact = cluster.greedy_cluster(vecs[:-1], threshold=0.8)
+            self.assertEqual(cluster.greedy_cluster(q, threshold=0.8), exact)
+        if cluster.np is not None:
+            self.assertEqual(cluster.greedy_cluster(q, threshold=0.8), exact)
+
+    def test_ann_finds_separated_clusters(self):
+        vecs = self._vectors(noise=0.1)
+        exact = cluster.greedy_cluster(vecs, threshold=0.8, ann=False)
+        with mock.patch.object(cluster, "np", None):
+            approx = cluster.greedy_cluster(vecs, threshold=0.8, ann=True)
+        self.assertEqual(approx, exact)
+
+    def test_ann_is_default_from_threshold(self):
+        vecs = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+        with mock.patch.object(cluster, "SeedIndex", wraps=cluster.SeedIndex) as idx:
+            cluster.greedy_cluster(vecs, threshold=0.9)
+            idx.assert_not_called()
+            with mock.patch.object(cluster, "ANN_THRESHOLD", 3):
+                cs = cluster.greedy_cluster(vecs, threshold=0.9)
+            idx.assert_called_once()
+        self.assertEqual(sorted(c["size"] for c in cs), [1, 2])
+
+    def test_seed_index_candidates_oldest_first(self):
+        index = cluster.SeedIndex(4, tables=2, bits=3)
+        v = [1.0, 0.5, -0.2, 0.1]
+        keys = index.keys(v)
+        self.assertEqual(len(keys), 2)
+        for c in (5, 2, 9):
+            index.add(c, keys)
+        self.assertEqual(index.candidates(keys), [2, 5, 9])
+        self.assertEqual(index.candidates(index.keys([-x for x in v])), [])
+
+    def test_seeds_come_first(self):
+        seeds = [cluster.normalize([0.0, 1.0])]
+        cs = cluster.greedy_cluster([[1.0, 0.0], [0.1, 1.0], [0.99, 0.01]], threshold=0.9, seeds=seeds)
+        self.assertEqual([(c["members"], c.get("seed")) for c in cs], [([0, 2], None), ([1], 0)])
+
+    def test_threshold_sweep(self):
+        # a~b at 0.98, b~c at 0.87, c~d at 0.71 (unit circle, 0.2 rad apart
+        # then 0.5 and 0.8); a and c only link through b.
+        angles = [0.0, 0.2, 0.7, 1.5]
+        vecs = [[math.cos(a), math.sin(a)] for a in angles]
+        sweep = cluster.threshold_sweep(vecs, [0.99, 0.9, 0.8, 0.5])
+        self.assertEqual(list(sweep), [0.99, 0.9, 0.8, 0.5])
+        self.assertEqual([[c["members"] for c in sweep[t]] for t in sweep],
+                         [[[0], [1], [2], [3]], [[0, 1], [2], [3]], [[0, 1, 2], [3]], [[0, 1, 2, 3]]])
+        self.assertEqual(cluster.threshold_sweep([], [0.8]), {})
+
+    def test_neighbour_edges_lsh_matches_all_pairs(self):
+        unit = [cluster.normalize(v) for v in self._vectors(noise=0.1)]
+        with mock.patch.object(cluster, "np", None):
+            exact = sorted(cluster.neighbour_edges(unit, 0.9, ann=False))
+            approx = sorted(cluster.neighbour_edges(unit, 0.9, ann=True))
+        self.assertTrue(exact)
+        self.assertEqual(approx, exact)
+
+    def test_neighbour_edges_lsh_by_default_from_sweep_threshold(self):
+        unit = [cluster.normalize(v) for v in self._vectors(noise=0.1)]
+        with mock.patch.object(cluster, "np", None), \
+             mock.patch.object(cluster, "SeedIndex", wraps=cluster.SeedIndex) as idx:
+            cluster.neighbour_edges(unit, 0.9)
+            idx.assert_not_called()
+            with mock.patch.object(cluster, "SWEEP_ANN_THRESHOLD", len(unit)):
+                cluster.neighbour_edges(unit, 0.9)
+            idx.assert_called_once()
+
+    def test_sweep_filled_from_the_same_embeddings(self):
+        sweep = dict.fromkeys([0.9, 0.5])
+        with mock.patch.object(cluster, "ollama_available", return_value=True), \
+             mock.patch.object(cluster, "embed", return_value=[[1.0, 0.0], [0.8, 0.6]]) as emb:
+            _, method = cluster.cluster(["a", "b"], sweep=sweep)
+        emb.assert_called_once()
+        self.assertEqual([len(sweep[0.9]), len(sweep[0.5])], [2, 1])
+
     def test_token_signature_cluster(self):
         cs = cluster.token_signature_cluster(["commit the changes", "commit the changes now", "run the tests"])
         self.assertEqual(sorted(c["size"] for c in cs), [1, 2])
 
+    def test_minhash_groups_reordered_near_duplicates(self):
+        cs = cluster.minhash_cluster(["please fix the build", "fix the build please",
+                                      "can you write the release notes", "can you review this function",
+                                      "fix the build please"])
+        self.assertEqual([c["members"] for c in cs], [[0, 1, 4], [2], [3]])
+
+    def test_minhash_signature(self):
+        sig = cluster.minhash("fix the build", size=16)
+        self.assertEqual(len(sig), 16)
+        self.assertEqual(sig, cluster.minhash("Fix  the build!", size=16))
+        self.assertEqual(cluster.minhash("", size=4), (0xFFFF,) * 4)
+        self.assertEqual(len(cluster.minhash_cluster(["", "   ", "?"])), 1)
+
+    def test_tfidf_vectors_unit_length(self):
+        vecs = cluster.tfidf_vectors(["fix the build", "fix the flaky test", ""])
+        self.assertAlmostEqual(sum(w * w for w in vecs[0].values()), 1.0)
+        self.assertEqual(set(vecs[1]), {"fix", "flaky", "test"})
+        # "fix" occurs in both, so it weighs less than the rarer terms.
+        self.assertLess(vecs[1]["fix"], vecs[1]["flaky"])
+        self.assertEqual(vecs[2], {})
+
+    def test_tfidf_groups_by_topic(self):
+        texts = ["update the release notes", "write the release notes please",
+                 "debug the login flow", "the login flow hangs", "release the notes now", ""]
+        cs = cluster.tfidf_cluster(texts, k=2)
+        self.assertEqual([c["members"] for c in cs], [[0, 1, 4], [2, 3], [5]])
+        self.assertEqual(cs[0]["keywords"], ["notes", "release"])
+        self.assertEqual(cs[2]["keywords"], [])
+
+    def test_method_selection(self):
+        texts = ["update the release notes", "update the release notes please"]
+        with mock.patch.object(cluster, "ollama_available") as probe:
+            self.assertEqual(cluster.cluster(texts, method="tfidf")[1], "tfidf")
+            self.assertEqual(cluster.cluster(texts, method="minhash")[1], "minhash")
+        probe.assert_not_called()
+
     def test_embed_parses_response(self):
         fake = mock.MagicMock()
         fake.read.return_value = b'{"embedding": [0.1, 0.2]}'
@@ -25,8 +238,129 @@ class TestCluster(unittest.TestCase):
     def test_cluster_falls_back_when_no_ollama(self):
         with mock.patch.object(cluster, "ollama_available", return_value=False):
             cs, method = cluster.cluster(["a b c", "a b c"], use_embeddings=True)
-            self.assertEqual(method, "token-signature")
+            self.assertEqual(method, "minhash")
             self.assertEqual(cs[0]["size"], 2)
 
+class TestBatchedEmbed(unittest.TestCase):
+    TEXTS = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    def _embed(self, base, **kw):
+        return cluster.embed(self.TEXTS, url=base + "/api/embeddings",
+                             batch_url=base + "/api/embed", **kw)
+
+    def test_chunks_through_batch_endpoint(self):
+        with fake_ollama() as (base, seen):
+            vecs = self._embed(base, batch_size=2)
+        self.assertEqual(vecs, [_vec(t) for t in self.TEXTS])
+        self.assertEqual(seen, ["/api/embed"] * 3)
+
+    def test_falls_back_to_single_endpoint(self):
+        with fake_ollama(batch=False) as (base, seen):
+            vecs = self._embed(base, batch_size=2)
+        self.assertEqual(vecs, [_vec(t) for t in self.TEXTS])
+        self.assertEqual(seen, ["/api/embed"] + ["/api/embeddings"] * 5)
+
+    def test_batch_size_one_uses_single_endpoint(self):
+        with fake_ollama() as (base, seen):
+            self._embed(base, batch_size=1)
+        self.assertEqual(seen, ["/api/embeddings"] * 5)
+
+    def test_unreachable_server_raises_unavailable(self):
+        base = closed_port_url()
+        with self.assertRaises(cluster.EmbeddingUnavailable):
+            self._embed(base)
+
+    def test_cluster_fails_open_when_embedding_fails(self):
+        with mock.patch.object(cluster, "ollama_available", return_value=True), \
+             mock.patch.object(cluster, "embed", side_effect=cluster.EmbeddingUnavailable("down")):
+            _, method = cluster.cluster(["a b c", "a b c"])
+        self.assertEqual(method, "minhash")
+
+    def test_explicit_embeddings_method_does_not_fall_back(self):
+        with mock.patch.object(cluster, "ollama_available", return_value=False):
+            with self.assertRaises(cluster.EmbeddingUnavailable):
+                cluster.cluster(["a b c"], method="embeddings")
+        with mock.patch.object(cluster, "ollama_available", return_value=True), \
+             mock.patch.object(cluster, "embed", side_effect=cluster.EmbeddingUnavailable("down")):
+            with self.assertRaises(cluster.EmbeddingUnavailable):
+                cluster.cluster(["a b c"], method="embeddings")
+
+class TestConcurrentEmbed(unittest.TestCase):
+    TEXTS = [f"prompt {'x' * n}" for n in range(40)]
+
+    def _embed(self, base, **kw):
+        kw.setdefault("concurrency", 4)
+        return cluster.embed(self.TEXTS, url=base + "/api/embeddings",
+                             batch_url=base + "/api/embed", **kw)
+
+    def test_preserves_order_over_keep_alive_connections(self):
+        clients = set()
+        with fake_ollama(batch=False, clients=clients) as (base, seen):
+            vecs = self._embed(base, batch_size=1)
+        self.assertEqual(vecs, [_vec(t) for t in self.TEXTS])
+        self.assertEqual(len(seen), 40)
+        self.assertLessEqual(len(clients), 4)
+
+    def test_concurrent_batches(self):
+        with fake_ollama() as (base, seen):
+            vecs = self._embed(base, batch_size=8)
+        self.assertEqual(vecs, [_vec(t) for t in self.TEXTS])
+        self.assertEqual(seen, ["/api/embed"] * 5)
+
+    def test_batch_unsupported_falls_back_to_single(self):
+        with fake_ollama(batch=False) as (base, seen):
+            vecs = self._embed(base, batch_size=8)
+        self.assertEqual(vecs, [_vec(t) for t in self.TEXTS])
+        self.assertEqual(seen.count("/api/embeddings"), 40)
+
+    def test_retries_transient_failures(self):
+        with fake_ollama(batch=False, fail_first=3) as (base, seen):
+            vecs = self._embed(base, batch_size=1)
+        self.assertEqual(vecs, [_vec(t) for t in self.TEXTS])
+        self.assertEqual(len(seen), 43)
+
+    def test_deadline_raises_unavailable(self):
+        with fake_ollama(delay=0.5) as (base, _):
+            t0 = time.monotonic()
+            with self.assertRaises(cluster.EmbeddingUnavailable):
+                self._embed(base, batch_size=1, deadline=0.2)
+            self.assertLess(time.monotonic() - t0, 0.45)
+
+    def test_unreachable_server_raises_unavailable(self):
+        with self.assertRaises(cluster.EmbeddingUnavailable):
+            self._embed(closed_port_url(), deadline=5)
+
+    def test_cluster_fails_open_past_deadline(self):
+        with fake_ollama(delay=0.5) as (base, _):
+            routed = functools.partial(cluster.embed, url=base + "/api/embeddings",
+                                       batch_url=base + "/api/embed")
+            with mock.patch.object(cluster, "ollama_available", return_value=True), \
+                 mock.patch.object(cluster, "embed", routed):
+                _, method = cluster.cluster(self.TEXTS, concurrency=4, deadline=0.2)
+        self.assertEqual(method, "minhash")
+
+class TestCachedEmbed(unittest.TestCase):
+    def test_only_misses_go_to_ollama(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = embed_cache.EmbeddingCache(Path(d))
+            cache.put(cluster.EMBED_MODEL, "bb", [9.0, 9.0])
+            with fake_ollama() as (base, seen):
+                vecs = cluster.embed(["a", "bb", "ccc"], url=base + "/api/embeddings",
+                                     batch_url=base + "/api/embed", cache=cache)
+            self.assertEqual([list(v) for v in vecs], [[1.0, 1.0], [9.0, 9.0], [3.0, 1.0]])
+            self.assertEqual(seen, ["/api/embed"])
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 2})
+
+    def test_fully_cached_run_needs_no_server(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = embed_cache.EmbeddingCache(Path(d))
+            for t in ("fix the build", "fix the build now"):
+                cache.put(cluster.EMBED_MODEL, t, [1.0, 0.0])
+            with mock.patch.object(cluster, "ollama_available") as probe:
+                clusters, method = cluster.cluster(["fix the build", "fix the build now"], cache=cache)
+            probe.assert_not_called()
+            self.assertEqual(method, "embeddings")
+            self.assertEqual(len(clusters), 1)
+
 if __name__ == "__main__":
     unittest.main()
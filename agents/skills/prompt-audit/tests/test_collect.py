@@ -1,4 +1,5 @@
-import sys, unittest
+import json, sys, tempfile, unittest
+from unittest import mock
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 import collect
@@ -50,6 +51,14 @@ class TestCollect(unittest.TestCase):
         self.assertEqual([p["text"] for p in out],
                          ["How do I emit <command-name>foo</command-name> in output?"])
 
+    def test_clean_prefix_classification(self):
+        self.assertIsNone(collect._clean("  <BASH-STDOUT>x</BASH-STDOUT>"))    # noise is case-insensitive
+        self.assertIsNone(collect._clean("<command-args>--fast</command-args>"))
+        self.assertIsNone(collect._clean("<system-reminder>r</system-reminder>\n[Request interrupted by user]"))
+        self.assertIsNone(collect._clean("<system-reminder>r</system-reminder>"))
+        self.assertEqual(collect._clean("run <command-args> here"), "run <command-args> here")
+        self.assertEqual(collect._clean("[request interrupted] is lowercase"), "[request interrupted] is lowercase")
+
     def test_filters_compact_summary_and_hook_and_bash(self):
         events = [
             user("real"),
@@ -80,5 +89,195 @@ class TestCollect(unittest.TestCase):
         out = collect.collect_from(events, since="2026-08-05T00:00:00Z")
         self.assertEqual([p["text"] for p in out], ["new"])
 
+class TestPromptRecord(unittest.TestCase):
+    def test_repeated_fields_are_shared(self):
+        events = [json.loads(json.dumps(e)) for e in (user("a"), user("b"), asst())]
+        a, b = collect.prompts_from_events(events)
+        self.assertIs(a.session, b.session)
+        self.assertIs(a.project, b.project)
+        self.assertIs(a.model, b.model)
+
+    def test_reads_like_a_dict(self):
+        p = collect.Prompt("hi", "proj", "s1", "2026-08-09T00:00:00Z")
+        self.assertEqual((p["text"], p.get("model"), p.get("nope", 1)), ("hi", None, 1))
+        with self.assertRaises(KeyError):
+            p["__class__"]
+        self.assertFalse(hasattr(p, "__dict__"))
+
+    def test_pickle_roundtrip_reinterns(self):
+        import pickle
+        p = pickle.loads(pickle.dumps(collect.Prompt("hi", "".join(["pr", "oj"]), "s1")))
+        self.assertEqual(p, collect.Prompt("hi", "proj", "s1"))
+        self.assertIs(p.project, collect._intern("proj"))
+
+class TestStreaming(unittest.TestCase):
+    def test_emits_as_soon_as_model_is_known(self):
+        it = collect.iter_prompts(iter([user("a"), asst(), user("b")]))
+        first = next(it)
+        self.assertEqual((first["text"], first["model"]), ("a", "claude-opus-4-8"))
+        self.assertEqual(next(it)["model"], None)   # flushed unanswered at end of stream
+
+    def test_pending_is_bounded(self):
+        events = [user(f"q{n}", session=f"s{n}") for n in range(5)] + [asst(session="s4")]
+        with mock.patch.object(collect, "_MAX_PENDING", 2):
+            out = list(collect.iter_prompts(events))
+        models = {p["text"]: p["model"] for p in out}
+        self.assertEqual([p["text"] for p in out][:3], ["q0", "q1", "q2"])   # evicted oldest-first
+        self.assertEqual(models, {"q0": None, "q1": None, "q2": None, "q3": None,
+                                  "q4": "claude-opus-4-8"})
+
+    def test_keeps_typed_order_across_sessions(self):
+        events = [user("a", session="s1"), user("b", session="s2"),
+                  asst("m2", session="s2"), asst("m1", session="s1")]
+        out = list(collect.iter_prompts(events))
+        self.assertEqual([(p["text"], p["model"]) for p in out], [("a", "m1"), ("b", "m2")])
+        it = collect.iter_prompts(iter(events[:3] + [user("c", session="s2")] + events[3:]))
+        self.assertEqual(next(it)["text"], "a")   # b waited behind a, not behind c
+
+    def test_since_drops_before_cleaning(self):
+        events = [user("old", ts="2026-08-01T00:00:00Z"), user("new", ts="2026-08-09T00:00:00Z")]
+        with mock.patch.object(collect, "_clean", wraps=collect._clean) as clean:
+            out = list(collect.iter_prompts(events, since="2026-08-05T00:00:00Z"))
+        self.assertEqual([p["text"] for p in out], ["new"])
+        self.assertEqual(clean.call_count, 1)
+
+def write_transcript(d, name, events):
+    p = Path(d) / name
+    p.write_text("".join(json.dumps(e) + "\n" for e in events), encoding="utf-8")
+    return p
+
+class TestIndex(unittest.TestCase):
+    def test_index_records_range_and_count(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = write_transcript(d, "a.jsonl", [user("one", ts="2026-08-01T00:00:00Z"), asst(),
+                                                user("two", ts="2026-08-03T00:00:00Z")])
+            index = {}
+            collect.collect(Path(d), index=index)
+            self.assertEqual(index[str(p)]["min"], "2026-08-01T00:00:00Z")
+            self.assertEqual(index[str(p)]["max"], "2026-08-03T00:00:00Z")
+            self.assertEqual(index[str(p)]["prompts"], 2)
+
+    def test_since_prunes_file_without_opening(self):
+        with tempfile.TemporaryDirectory() as d:
+            write_transcript(d, "old.jsonl", [user("old", ts="2026-08-01T00:00:00Z")])
+            write_transcript(d, "new.jsonl", [user("new", ts="2026-08-09T00:00:00Z")])
+            index = {}
+            collect.collect(Path(d), index=index)
+            with mock.patch("common.iter_file_events", wraps=collect.common.iter_file_events) as it:
+                out = collect.collect(Path(d), since="2026-08-05T00:00:00Z", index=index)
+            self.assertEqual([p["text"] for p in out], ["new"])
+            self.assertEqual([c.args[0].name for c in it.call_args_list], ["new.jsonl"])
+
+    def test_changed_file_is_reopened(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = write_transcript(d, "a.jsonl", [user("old", ts="2026-08-01T00:00:00Z")])
+            index = {}
+            collect.collect(Path(d), index=index)
+            with p.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(user("later", ts="2026-08-09T00:00:00Z")) + "\n")
+            out = collect.collect(Path(d), since="2026-08-05T00:00:00Z", index=index)
+            self.assertEqual([x["text"] for x in out], ["later"])
+            self.assertEqual(index[str(p)]["prompts"], 2)
+
+    def test_resumed_tail_merges_into_entry(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = write_transcript(d, "a.jsonl", [user("one", ts="2026-08-01T00:00:00Z")])
+            index, cursors = {}, {}
+            collect.collect(Path(d), cursors=cursors, index=index)
+            with p.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(user("two", ts="2026-08-09T00:00:00Z")) + "\n")
+            out = collect.collect(Path(d), cursors=cursors, index=index)
+            self.assertEqual([x["text"] for x in out], ["two"])
+            self.assertEqual(index[str(p)]["min"], "2026-08-01T00:00:00Z")
+            self.assertEqual(index[str(p)]["max"], "2026-08-09T00:00:00Z")
+            self.assertEqual(index[str(p)]["prompts"], 2)
+
+    def test_resume_after_refresh_does_not_double_count(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = write_transcript(d, "a.jsonl", [user("one", ts="2026-08-01T00:00:00Z")])
+            index, cursors = {}, {}
+            collect.collect(Path(d), cursors=cursors, index=index)
+            with p.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(user("two", ts="2026-08-09T00:00:00Z")) + "\n")
+            collect.refresh_index(index, Path(d))   # --count: full rescan, cursor unmoved
+            self.assertEqual(collect.count_in_window(index), (2, 2))
+            out = collect.collect(Path(d), cursors=cursors, index=index)
+            self.assertEqual([x["text"] for x in out], ["two"])
+            self.assertEqual(index[str(p)]["prompts"], 2)
+            self.assertEqual(index[str(p)]["min"], "2026-08-01T00:00:00Z")
+            self.assertEqual(index[str(p)]["end"], p.stat().st_size)
+            self.assertEqual(collect.count_in_window(index), (2, 2))
+
+    def test_count_in_window_bounds(self):
+        index = {
+            "a": {"min": "2026-08-01T00:00:00Z", "max": "2026-08-02T00:00:00Z", "prompts": 4},
+            "b": {"min": "2026-08-04T00:00:00Z", "max": "2026-08-08T00:00:00Z", "prompts": 3},
+            "c": {"min": "2026-08-06T00:00:00Z", "max": "2026-08-07T00:00:00Z", "prompts": 2},
+        }
+        self.assertEqual(collect.count_in_window(index), (9, 9))
+        self.assertEqual(collect.count_in_window(index, since="2026-08-05T00:00:00Z"), (2, 5))
+
+    def test_refresh_index_drops_deleted_transcripts(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = write_transcript(d, "a.jsonl", [user("one")])
+            index = collect.refresh_index({"/gone.jsonl": {"prompts": 1}}, Path(d))
+            self.assertEqual(list(index), [str(p)])
+
+    def test_stream_drops_state_of_deleted_transcripts(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = write_transcript(d, "a.jsonl", [user("one")])
+            gone = write_transcript(d, "b.jsonl", [user("two")])
+            index, cursors = {}, {}
+            collect.collect(Path(d), cursors=cursors, index=index)
+            gone.unlink()
+            collect.collect(Path(d), cursors=cursors, index=index)
+            self.assertEqual((list(cursors), list(index)), ([str(p)], [str(p)]))
+
+class TestPrefilterScan(unittest.TestCase):
+    def test_prefiltered_scan_matches_full_decode(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "a.jsonl"
+            lines = [json.dumps(user("one")), json.dumps(asst()),
+                     '{"type":"progress","sessionId":"s1","data":{"type":"user"}}',
+                     json.dumps(user("two"), separators=(",", ":")),
+                     '{"type":"system","content":"x"}',
+                     json.dumps(asst(model="claude-sonnet-4-6"), separators=(",", ":"))]
+            p.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            full = collect.prompts_from_events(collect.common.iter_file_events(p))
+            self.assertEqual(collect.scan_file(p), full)
+            self.assertEqual([x["model"] for x in full], ["claude-opus-4-8", "claude-sonnet-4-6"])
+
+class TestParallel(unittest.TestCase):
+    def _tree(self, d):
+        for n in range(6):
+            write_transcript(d, f"t{n}.jsonl", [
+                user(f"p{n}a", session=f"s{n}", ts=f"2026-08-0{n + 1}T00:00:00Z"),
+                asst(model=f"m{n % 2}", session=f"s{n}"),
+                user("<bash-stdout>x</bash-stdout>", session=f"s{n}"),
+                user(f"p{n}b", session=f"s{n}", ts=f"2026-08-0{n + 1}T01:00:00Z"),
+            ])
+
+    def test_pool_matches_serial(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._tree(d)
+            serial_idx, pool_idx, serial_cur, pool_cur = {}, {}, {}, {}
+            serial = collect.collect(Path(d), since="2026-08-02T00:00:00Z",
+                                     cursors=serial_cur, index=serial_idx)
+            pooled = collect.collect(Path(d), since="2026-08-02T00:00:00Z",
+                                     cursors=pool_cur, index=pool_idx, workers=2)
+            self.assertEqual(pooled, serial)
+            self.assertEqual(pool_idx, serial_idx)
+            self.assertEqual(pool_cur, serial_cur)
+            models = {p["text"]: p["model"] for p in pooled}
+            self.assertEqual(models["p2a"], "m0")
+            self.assertIsNone(models["p2b"])
+
+    def test_falls_back_to_serial_when_pool_fails(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._tree(d)
+            with mock.patch.object(collect, "ProcessPoolExecutor", side_effect=OSError("no fork")):
+                out = collect.collect(Path(d), workers=4)
+            self.assertEqual(len(out), 12)
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,4 @@
-import os, sys, tempfile, unittest
+import os, re, sys, tempfile, unittest
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 import common
@@ -41,5 +41,82 @@ class TestCommon(unittest.TestCase):
             self.assertIsNone(common.read_json(p))
             self.assertEqual(common.read_json(p, default={}), {})
 
+class TestCursors(unittest.TestCase):
+    def _events(self, path, cursors):
+        return [e["n"] for e in common.iter_file_events(path, cursors)]
+
+    def test_resumes_at_appended_tail(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_text('{"n": 1}\n{"n": 2}\n', encoding="utf-8")
+            cursors = {}
+            self.assertEqual(self._events(p, cursors), [1, 2])
+            self.assertEqual(cursors[str(p)]["offset"], p.stat().st_size)
+            with p.open("a", encoding="utf-8") as fh:
+                fh.write('{"n": 3}\n')
+            self.assertEqual(self._events(p, cursors), [3])
+            self.assertEqual(self._events(p, cursors), [])
+
+    def test_partial_last_line_is_left_for_next_run(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_text('{"n": 1}\n{"n": ', encoding="utf-8")
+            cursors = {}
+            self.assertEqual(self._events(p, cursors), [1])
+            with p.open("a", encoding="utf-8") as fh:
+                fh.write('2}\n')
+            self.assertEqual(self._events(p, cursors), [2])
+
+    def test_truncated_or_replaced_file_is_rescanned(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_text('{"n": 1}\n{"n": 2}\n', encoding="utf-8")
+            cursors = {}
+            self._events(p, cursors)
+            p.write_text('{"n": 9}\n', encoding="utf-8")          # truncated
+            self.assertEqual(self._events(p, cursors), [9])
+            tmp = Path(d) / "new.jsonl"
+            tmp.write_text('{"n": 7}\n{"n": 8}\n{"n": 9}\n', encoding="utf-8")
+            tmp.replace(p)                                          # new inode
+            self.assertEqual(self._events(p, cursors), [7, 8, 9])
+
+    def test_no_cursors_reads_everything(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_text('{"n": 1}\n\nnot json\n{"n": 2}', encoding="utf-8")
+            self.assertEqual(self._events(p, None), [1, 2])
+            self.assertEqual([e["n"] for e in common.iter_events(Path(d))], [1, 2])
+
+class TestPrefilter(unittest.TestCase):
+    WANT = re.compile(rb'"keep"')
+
+    def test_skips_unmatched_lines_and_tracks_offset(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_text('{"n": 1, "k": "keep"}\n{"n": 2}\n\n{"n": 3, "k": "keep"}\n{"n": 4}\n',
+                         encoding="utf-8")
+            cursors = {}
+            got = [e["n"] for e in common.iter_file_events(p, cursors, prefilter=self.WANT)]
+            self.assertEqual(got, [1, 3])
+            self.assertEqual(cursors[str(p)]["offset"], p.stat().st_size)
+
+    def test_unterminated_tail_is_left_for_next_run(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_text('{"n": 1, "k": "keep"}\n{"n": 2, "k": "ke', encoding="utf-8")
+            cursors = {}
+            got = [e["n"] for e in common.iter_file_events(p, cursors, prefilter=self.WANT)]
+            self.assertEqual(got, [1])
+            with p.open("a", encoding="utf-8") as fh:
+                fh.write('ep"}\n')
+            got = [e["n"] for e in common.iter_file_events(p, cursors, prefilter=self.WANT)]
+            self.assertEqual(got, [2])
+
+    def test_empty_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            p = Path(d) / "t.jsonl"
+            p.write_bytes(b"")
+            self.assertEqual(list(common.iter_file_events(p, {}, prefilter=self.WANT)), [])
+
 if __name__ == "__main__":
     unittest.main()
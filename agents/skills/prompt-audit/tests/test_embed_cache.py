@@ -0,0 +1,74 @@
+import sys, tempfile, unittest
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import embed_cache, quantize
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip_and_counts(self):
+        c = embed_cache.EmbeddingCache(self.dir)
+        self.assertEqual(c.get_many("m", ["run the tests"]), [None])
+        c.put("m", "run the tests", [0.5, 0.25])
+        c.save()
+        again = embed_cache.EmbeddingCache(self.dir)
+        vecs = again.get_many("m", ["run  the\ntests", "other"])
+        self.assertEqual(list(vecs[0]), [0.5, 0.25])
+        self.assertIsNone(vecs[1])
+        self.assertEqual(again.stats(), {"hits": 1, "misses": 1})
+
+    def test_keyed_by_model(self):
+        c = embed_cache.EmbeddingCache(self.dir)
+        c.put("a", "x", [1.0])
+        c.save()
+        c = embed_cache.EmbeddingCache(self.dir)
+        self.assertTrue(c.covers("a", ["x"]))
+        self.assertFalse(c.covers("b", ["x"]))
+
+    def test_stored_as_float32_not_json(self):
+        c = embed_cache.EmbeddingCache(self.dir)
+        c.put("m", "x", [0.1] * 768)
+        c.save()
+        self.assertEqual((self.dir / "vectors-0.bin").stat().st_size, 768 * 4)
+        self.assertLess((self.dir / "index.json").stat().st_size, 200)
+
+    def test_int8_entries(self):
+        c = embed_cache.EmbeddingCache(self.dir, codec=quantize.Codec("i8"))
+        c.put("m", "x", [0.1] * 768)
+        c.save()
+        self.assertEqual((self.dir / "vectors-0.bin").stat().st_size, 4 + 768)
+        self.assertFalse(embed_cache.EmbeddingCache(self.dir).covers("m", ["x"]))
+        vec = embed_cache.EmbeddingCache(self.dir, codec=quantize.Codec("i8")).get_many("m", ["x"])[0]
+        self.assertIsInstance(vec, quantize.QVec)
+        self.assertAlmostEqual(vec.dot(vec), 1.0, places=2)
+
+    def test_truncated_file_is_a_miss(self):
+        c = embed_cache.EmbeddingCache(self.dir)
+        c.put("m", "x", [1.0, 2.0])
+        c.save()
+        (self.dir / "vectors-0.bin").write_bytes(b"\0\0")
+        self.assertEqual(embed_cache.EmbeddingCache(self.dir).get_many("m", ["x"]), [None])
+
+    def test_evicts_least_recently_used(self):
+        c = embed_cache.EmbeddingCache(self.dir, max_bytes=3 * 16)
+        for t in ("a", "b", "c"):
+            c.put("m", t, [1.0] * 4)
+        c.save()
+        c = embed_cache.EmbeddingCache(self.dir, max_bytes=3 * 16)
+        c.get_many("m", ["a"])           # a is now the most recently used
+        c.put("m", "d", [2.0] * 4)
+        c.save()
+        c = embed_cache.EmbeddingCache(self.dir, max_bytes=3 * 16)
+        self.assertEqual(c.file, "vectors-1.bin")
+        self.assertFalse((self.dir / "vectors-0.bin").exists())
+        self.assertTrue(c.covers("m", ["a", "d"]))
+        self.assertFalse(c.covers("m", ["b"]) or c.covers("m", ["c"]))
+        self.assertEqual([list(v) for v in c.get_many("m", ["a", "d"])], [[1.0] * 4, [2.0] * 4])
+
+if __name__ == "__main__":
+    unittest.main()
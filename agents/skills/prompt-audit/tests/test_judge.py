@@ -1,9 +1,13 @@
-import sys, unittest
+import json, os, sys, tempfile, textwrap, time, unittest
+from types import SimpleNamespace
 from unittest import mock
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 import judge
 
+def _reply(*results):
+    return json.dumps({"result": json.dumps(list(results))})
+
 class TestJudge(unittest.TestCase):
     def test_select_items_reps_then_offenders_capped(self):
         prompts = [{"text": f"p{i}", "model": "m"} for i in range(5)]
@@ -14,6 +18,95 @@ class TestJudge(unittest.TestCase):
         self.assertEqual(got[2], 3)                 # worst offender next
         self.assertEqual(len(got), 3)               # capped
 
+    def test_select_items_fills_cap_around_cached(self):
+        prompts = [{"text": f"p{i}", "model": "m"} for i in range(5)]
+        clusters = [{"representative": i, "size": 5 - i} for i in range(5)]
+        got = judge.select_items(prompts, clusters, {}, cap=2, cached=lambda i: i in (0, 2))
+        self.assertEqual(got, [0, 1, 2, 3])
+        got = judge.select_items(prompts, clusters, {}, cap=1, cached=lambda i: i in (0, 2))
+        self.assertEqual(got, [0, 1])
+
+    def test_cache_key_tracks_guidance_and_model(self):
+        p = {"text": "fix  it", "model": "m"}
+        guide = {"m": [SimpleNamespace(body="be specific")]}
+        k = judge.cache_key(p, guide)
+        self.assertEqual(k, judge.cache_key({"text": "fix it", "model": "m"}, guide))
+        self.assertNotEqual(k, judge.cache_key(p, {"m": [SimpleNamespace(body="be brief")]}))
+        self.assertNotEqual(k, judge.cache_key(p, guide, model="other"))
+        self.assertNotEqual(k, judge.cache_key({"text": "fix it", "model": "n"}, guide))
+
+    def test_judge_reuses_cached_judgments(self):
+        prompts = [{"text": "fix it", "model": "m"}, {"text": "do it", "model": "m"}]
+        cache = {}
+        with mock.patch.object(judge, "run_claude",
+                               return_value=_reply({"index": 0, "violations": ["vague"], "rewrite": "name it"})):
+            first = judge.judge([0], prompts, {}, cache=cache)
+        self.assertEqual(first[0]["rewrite"], "name it")
+        self.assertNotIn("cached", first[0])
+        with mock.patch.object(judge, "run_claude",
+                               return_value=_reply({"index": 1, "violations": [], "rewrite": "x"})) as rc:
+            both = judge.judge([0, 1], prompts, {}, cache=cache)
+        self.assertEqual([(r["index"], r.get("cached", False)) for r in both], [(0, True), (1, False)])
+        self.assertIn("### index 1", rc.call_args[0][0])
+        self.assertNotIn("### index 0", rc.call_args[0][0])
+        with mock.patch.object(judge, "run_claude") as rc:
+            self.assertEqual(len(judge.judge([1, 0], prompts, {}, cache=cache)), 2)
+        rc.assert_not_called()
+
+    def test_save_cache_keeps_most_recently_used(self):
+        with tempfile.TemporaryDirectory() as d, mock.patch.object(judge, "MAX_JUDGMENTS", 2):
+            path = Path(d) / "judgments.json"
+            judge.save_cache({"a": {"used": "2026-01-01"}, "b": {"used": "2026-03-01"},
+                              "c": {"used": "2026-02-01"}}, path)
+            self.assertEqual(sorted(judge.load_cache(path)), ["b", "c"])
+
+    def test_truncate_keeps_head_and_tail(self):
+        text = "ask: " + "x" * 10_000 + " error: boom"
+        cut, n = judge.truncate(text, tokens=100)
+        self.assertEqual(n, len(text) - 400)
+        self.assertTrue(cut.startswith("ask: "))
+        self.assertTrue(cut.endswith("error: boom"))
+        self.assertIn(f"[… {n} characters truncated …]", cut)
+        self.assertEqual(judge.truncate("short", tokens=100), ("short", 0))
+
+    def test_build_prompt_dedupes_shared_guidance(self):
+        shared, opus = SimpleNamespace(body="be specific"), SimpleNamespace(body="state the goal")
+        prompts = [{"text": "a", "model": "opus"}, {"text": "b", "model": "sonnet"}]
+        text = judge.build_prompt([0, 1], prompts, {"opus": [shared, opus], "sonnet": [shared]})
+        self.assertEqual(text.count("be specific"), 1)
+        self.assertIn("## Guidance for opus, sonnet\nbe specific\n\n## Guidance for opus\nstate the goal\n", text)
+
+    def test_pack_fits_priority_items_under_budget(self):
+        guide = {"m": [SimpleNamespace(body="g" * 400)]}
+        prompts = [{"text": "p" * 2400, "model": "m"}, {"text": "q" * 20_000, "model": "m"},
+                   {"text": "r" * 3000, "model": "m"}, {"text": "s" * 40, "model": "m"}]
+        kept, stats = judge.pack([0, 1, 2, 3], prompts, guide, budget=1400, item_tokens=500)
+        self.assertEqual(kept, [0, 1, 3])
+        self.assertEqual((stats["sent"], stats["dropped"], stats["truncated"]), (3, 1, 2))
+        self.assertEqual(stats["truncated_tokens"], 400 // 4 + 18_000 // 4)
+        sent = judge.build_prompt(kept, prompts, guide, item_tokens=500)
+        self.assertLessEqual(judge.estimate_tokens(sent), 1400)
+        self.assertAlmostEqual(judge.estimate_tokens(sent), stats["tokens"], delta=20)
+
+    def test_judge_reports_packing(self):
+        prompts = [{"text": "fix it " * 2000, "model": "m"}]
+        packing = {}
+        with mock.patch.object(judge, "run_claude", return_value=_reply({"index": 0, "rewrite": "x"})) as rc:
+            judge.judge([0], prompts, {}, packing=packing)
+        self.assertEqual((packing["sent"], packing["truncated"]), (1, 1))
+        self.assertLess(len(rc.call_args[0][0]), 5000)
+
+    def test_object_scanner_across_chunks(self):
+        scanner = judge.ObjectScanner()
+        text = 'ok [{"index": 0, "rewrite": "use {braces} and \\"quotes\\""}, {"index": 1, "v": [}, {"index": 2}]'
+        got = [obj for k in range(0, len(text), 3) for obj in scanner.feed(text[k:k + 3])]
+        self.assertEqual(got, [{"index": 0, "rewrite": 'use {braces} and "quotes"'}, {"index": 2}])
+        self.assertEqual(scanner.bad, 1)
+
+    def test_parse_result_salvages_around_malformed_object(self):
+        out = json.dumps({"result": '[{"index": 0, "rewrite": "a"}, {"index": 1, oops}]'})
+        self.assertEqual(judge.parse_result(out), [{"index": 0, "rewrite": "a"}])
+
     def test_parse_result_from_wrapped_json(self):
         out = '{"result": "Here: [{\\"index\\":0,\\"violations\\":[\\"vague\\"],\\"rewrite\\":\\"be specific\\"}]"}'
         parsed = judge.parse_result(out)
@@ -38,5 +131,120 @@ class TestJudge(unittest.TestCase):
     def test_judge_empty_indices(self):
         self.assertEqual(judge.judge([], [], {}), [])
 
+# Answers each "### index N" in its prompt, after sleeping for any index
+# listed in $FAKE_CLAUDE_SLOW; logs start and end times to $FAKE_CLAUDE_LOG.
+# With stream-json output it streams the answer as small text deltas, then
+# the whole message and result; indices in $FAKE_CLAUDE_BAD get a malformed
+# object, and it stalls after any index in $FAKE_CLAUDE_STALL.
+FAKE_CLAUDE = """\
+    #!{python}
+    import json, os, re, sys, time
+    prompt = sys.stdin.read()
+    indices = [int(i) for i in re.findall(r"^### index (\\d+)", prompt, re.M)]
+    start = time.time()
+    ids = lambda name: {{int(i) for i in os.environ.get(name, "").split(",") if i}}
+    time.sleep(float(os.environ.get("FAKE_CLAUDE_DELAY", "0")) + (30 if ids("FAKE_CLAUDE_SLOW") & set(indices) else 0))
+    with open(os.environ["FAKE_CLAUDE_LOG"], "a") as log:
+        log.write(json.dumps([indices, start, time.time()]) + "\\n")
+    result = [{{"index": i, "violations": [], "rewrite": f"judged {{i}} {{{{ok}}}}"}} for i in indices]
+    if "stream-json" not in sys.argv:
+        print(json.dumps({{"result": json.dumps(result)}}))
+        sys.exit()
+    emit = lambda event: print(json.dumps(event), flush=True)
+    emit({{"type": "system", "subtype": "init"}})
+    text = ""
+    for n, r in enumerate(result):
+        piece = ("Here you go:\\n[" if n == 0 else ",\\n") + (
+            '{{"index": %d, "violations": [oops]}}' % r["index"] if r["index"] in ids("FAKE_CLAUDE_BAD")
+            else json.dumps(r))
+        text += piece
+        for k in range(0, len(piece), 7):
+            emit({{"type": "stream_event", "event": {{"type": "content_block_delta",
+                  "delta": {{"type": "text_delta", "text": piece[k:k + 7]}}}}}})
+        if r["index"] in ids("FAKE_CLAUDE_STALL"):
+            time.sleep(30)
+    text += "]"
+    emit({{"type": "stream_event", "event": {{"type": "content_block_delta",
+          "delta": {{"type": "text_delta", "text": "]"}}}}}})
+    emit({{"type": "assistant", "message": {{"content": [{{"type": "text", "text": text}}]}}}})
+    emit({{"type": "result", "result": text}})
+"""
+
+class TestShardedJudge(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        bin_dir = Path(self.tmp.name)
+        exe = bin_dir / "claude"
+        exe.write_text(textwrap.dedent(FAKE_CLAUDE.format(python=sys.executable)))
+        exe.chmod(0o755)
+        self.log = bin_dir / "calls.log"
+        env = mock.patch.dict(os.environ, {"PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+                                           "FAKE_CLAUDE_LOG": str(self.log)})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.prompts = [{"text": f"prompt {i}", "model": "m"} for i in range(12)]
+
+    def calls(self):
+        return [json.loads(line) for line in self.log.read_text().splitlines()]
+
+    def test_shards_run_concurrently(self):
+        with mock.patch.dict(os.environ, {"FAKE_CLAUDE_DELAY": "0.5"}), \
+             mock.patch.object(judge, "JUDGE_SHARD", 4):
+            got = judge.judge(list(range(12)), self.prompts, {}, workers=3)
+        self.assertEqual(sorted(r["index"] for r in got), list(range(12)))
+        calls = self.calls()
+        self.assertEqual(sorted(map(len, (c[0] for c in calls))), [4, 4, 4])
+        # Every shard started before any finished.
+        self.assertLess(max(c[1] for c in calls), min(c[2] for c in calls))
+
+    def test_deadline_keeps_finished_shards(self):
+        with mock.patch.dict(os.environ, {"FAKE_CLAUDE_SLOW": "5"}), \
+             mock.patch.object(judge, "JUDGE_SHARD", 4):
+            t0 = time.monotonic()
+            got = judge.judge(list(range(12)), self.prompts, {}, workers=3, deadline=2.0)
+        self.assertLess(time.monotonic() - t0, 10)
+        self.assertEqual(sorted(r["index"] for r in got), [0, 1, 2, 3, 8, 9, 10, 11])
+
+    def test_shard_answers_only_for_its_prompts(self):
+        with mock.patch.object(judge, "run_claude",
+                               return_value=_reply({"index": 0, "rewrite": "a"}, {"index": 7, "rewrite": "b"})), \
+             mock.patch.object(judge, "JUDGE_SHARD", 2):
+            got = judge.judge([0, 1, 2, 3], self.prompts, {}, workers=2)
+        self.assertEqual([r["index"] for r in got], [0])
+
+    def test_cached_prompts_skip_the_shards(self):
+        cache = {judge.cache_key(self.prompts[0], {}): {"violations": [], "rewrite": "old"}}
+        with mock.patch.object(judge, "JUDGE_SHARD", 2):
+            got = judge.judge([0, 1, 2], self.prompts, {}, cache=cache, workers=2)
+        self.assertEqual([(r["index"], r["rewrite"]) for r in got],
+                         [(0, "old"), (1, "judged 1 {ok}"), (2, "judged 2 {ok}")])
+        self.assertEqual([c[0] for c in self.calls()], [[1, 2]])
+
+    def test_stream_parses_objects_as_they_arrive(self):
+        with mock.patch.dict(os.environ, {"FAKE_CLAUDE_BAD": "1"}):
+            seen_ = []
+            got = judge.run_claude_stream("### index 0\n### index 1\n### index 2\n", on_result=seen_.append)
+        self.assertEqual([r["index"] for r in got], [0, 2])
+        self.assertEqual(seen_, got)
+        self.assertEqual(got[0]["rewrite"], "judged 0 {ok}")
+
+    def test_stream_deadline_keeps_partial_results(self):
+        partial = judge.PartialResults(Path(self.tmp.name) / "partial.jsonl")
+        with mock.patch.dict(os.environ, {"FAKE_CLAUDE_STALL": "1"}):
+            t0 = time.monotonic()
+            got = judge.judge([0, 1, 2], self.prompts, {}, deadline=1.5, stream=True, partial=partial)
+        self.assertLess(time.monotonic() - t0, 10)
+        self.assertEqual([r["index"] for r in got], [0, 1])
+        lines = partial.path.read_text().splitlines()
+        self.assertEqual([json.loads(line)["index"] for line in lines], [0, 1])
+
+    def test_stream_sharded(self):
+        partial = judge.PartialResults(Path(self.tmp.name) / "partial.jsonl")
+        with mock.patch.object(judge, "JUDGE_SHARD", 2):
+            got = judge.judge(list(range(5)), self.prompts, {}, workers=3, stream=True, partial=partial)
+        self.assertEqual(sorted(r["index"] for r in got), list(range(5)))
+        self.assertEqual(len(partial.path.read_text().splitlines()), 5)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+import math, random, sys, unittest
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import quantize
+
+def _unit(v):
+    n = math.sqrt(sum(x * x for x in v))
+    return [x / n for x in v]
+
+def _cos(a, b):
+    return sum(x * y for x, y in zip(_unit(a), _unit(b)))
+
+class TestQuantize(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.a = [rng.gauss(0, 1) for _ in range(768)]
+        self.b = [x + rng.gauss(0, 0.5) for x in self.a]
+
+    def test_int8_dot_on_quantized_form(self):
+        codec = quantize.Codec("i8")
+        data = codec.encode(self.a)
+        self.assertEqual(len(data), 4 + 768)
+        qa, qb = codec.decode(data), codec.decode(codec.encode(self.b))
+        self.assertIsInstance(qa, quantize.QVec)
+        self.assertEqual(qa.q.typecode, "b")
+        self.assertAlmostEqual(qa.dot(qb), _cos(self.a, self.b), places=2)
+        self.assertAlmostEqual(qa.dot(qa), 1.0, places=2)
+        self.assertEqual(len(list(qa)), 768)
+
+    def test_f16_roundtrip(self):
+        codec = quantize.Codec("f16")
+        data = codec.encode(self.a)
+        self.assertEqual(len(data), 2 * 768)
+        for x, y in zip(codec.decode(data), _unit(self.a)):
+            self.assertAlmostEqual(x, y, places=3)
+
+    def test_f32_stores_vectors_as_given(self):
+        codec = quantize.Codec()
+        self.assertEqual(list(codec.decode(codec.encode([0.5, 0.25]))), [0.5, 0.25])
+
+    def test_projection_is_seeded_and_keeps_similarity(self):
+        codec = quantize.Codec("f32", dim=256, seed=1)
+        pa = codec.decode(codec.encode(self.a))
+        self.assertEqual(len(pa), 256)
+        again = quantize.Codec("f32", dim=256, seed=1)
+        self.assertEqual(again.decode(again.encode(self.a)), pa)
+        pb = codec.decode(codec.encode(self.b))
+        self.assertAlmostEqual(_cos(pa, pb), _cos(self.a, self.b), delta=0.05)
+        self.assertEqual(codec.tag, "f32-p256s1")
+        self.assertEqual(codec.space("m"), "m-p256s1")
+        self.assertEqual(quantize.Codec("i8").space("m"), "m")
+
+    def test_projection_keeps_similarity_of_offset_vectors(self):
+        # Real embeddings share a nonzero mean; signs correlated within a
+        # projection row would inflate the cosine of unrelated vectors.
+        rng = random.Random(5)
+        a = [0.05 + rng.gauss(0, 0.1) for _ in range(768)]
+        b = [0.05 + rng.gauss(0, 0.1) for _ in range(768)]
+        codec = quantize.Codec("f32", dim=256)
+        pa, pb = (codec.decode(codec.encode(v)) for v in (a, b))
+        self.assertAlmostEqual(_cos(pa, pb), _cos(a, b), delta=0.1)
+
+    def test_projection_signs_are_independent(self):
+        same = pairs = 0
+        for plus, minus in quantize.Projection(768, 256, seed=2).rows:
+            k = len(plus) + len(minus)
+            same += (len(plus) - len(minus)) ** 2 - k   # sum of s_i * s_j, i != j
+            pairs += k * (k - 1)
+        self.assertLess(abs(same / pairs), 0.02)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            quantize.Codec("i4")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,6 +18,50 @@ class TestReport(unittest.TestCase):
         self.assertIn("First run", md)
         self.assertIn("name it", md)
 
+    def test_summarize_weights_by_counts(self):
+        prompts = [{"text": "fix it"}, {"text": "go"}]
+        s = report.summarize(prompts, {0: [{"check": "ambiguous_referent"}]}, [], "x",
+                             counts=[3, 2], repeats=3)
+        self.assertEqual((s["prompts"], s["flagged"], s["repeats"]), (5, 3, 3))
+        self.assertEqual(s["check_counts"], {"ambiguous_referent": 3})
+        self.assertIn("Repeat prompts: 3", report.render(s, [], prompts, [], None))
+
+    def test_embedding_cache_counts(self):
+        s = report.summarize([{"text": "go"}], {}, [], "embeddings", embed_cache={"hits": 4, "misses": 1})
+        self.assertEqual(s["embedding_cache"], {"hits": 4, "misses": 1})
+        self.assertIn("Embedding cache: 4 hits, 1 misses", report.render(s, [], [{"text": "go"}], [], None))
+        self.assertNotIn("embedding_cache", report.summarize([], {}, [], "x"))
+
+    def test_theme_growth(self):
+        prompts = [{"text": "fix the build"}, {"text": "write docs"}]
+        clusters = [{"members": [0], "representative": 0, "size": 3, "theme": "t1", "total": 40, "new_theme": False},
+                    {"members": [1], "representative": 1, "size": 1, "theme": "t7", "total": 1, "new_theme": True}]
+        rows = [{"theme": "t1", "representative": "fix | the build", "added": 3, "total": 40, "history": [12, 25, 3]}]
+        s = report.summarize(prompts, {}, clusters, "embeddings", themes=rows)
+        md = report.render(s, clusters, prompts, [], None)
+        self.assertIn("**3×** fix the build · 40× all time", md)
+        self.assertIn("**1×** write docs · new theme", md)
+        self.assertIn("| fix \\| the build | +3 | 40 | 12 → 25 → 3 |", md)
+        self.assertNotIn("Theme growth", report.render(report.summarize(prompts, {}, [], "x"), [], prompts, [], None))
+
+    def test_cluster_keywords(self):
+        prompts = [{"text": "update the release notes"}]
+        clusters = [{"members": [0], "representative": 0, "size": 2, "keywords": ["notes", "release"]}]
+        md = report.render(report.summarize(prompts, {}, clusters, "tfidf"), clusters, prompts, [], None)
+        self.assertIn("**2×** update the release notes — _notes, release_", md)
+        self.assertIn("clustering: tfidf", md)
+
+    def test_threshold_sweep_table(self):
+        prompts = [{"text": "fix the build"}, {"text": "fix | the tests"}, {"text": "write docs"}]
+        sweep = {0.9: [{"members": [0], "representative": 0}, {"members": [1], "representative": 1},
+                       {"members": [2], "representative": 2}],
+                 0.8: [{"members": [0, 1], "representative": 0}, {"members": [2], "representative": 2}]}
+        s = report.summarize(prompts, {}, [], "embeddings", counts=[2, 1, 5], sweep=sweep)
+        self.assertEqual([(r["threshold"], r["clusters"]) for r in s["sweep"]], [(0.9, 3), (0.8, 2)])
+        md = report.render(s, [], prompts, [], None)
+        self.assertIn("| 0.90 | 3 | 5× write docs; 2× fix the build; 1× fix \\| the tests |", md)
+        self.assertIn("| 0.80 | 2 | 5× write docs; 3× fix the build |", md)
+
     def test_render_skips_non_dict_judge_result(self):
         prompts = [{"text": "fix it", "model": "m"}]
         s = {"prompts": 1, "flagged": 0, "cluster_method": "x", "check_counts": {}}
@@ -26,6 +70,25 @@ class TestReport(unittest.TestCase):
         self.assertIn("# Prompt Audit", md)
         self.assertIn("vague", md)
 
+    def test_render_marks_cached_judgments(self):
+        prompts = [{"text": "fix it", "model": "m"}, {"text": "do the thing", "model": "m"}]
+        s = {"prompts": 2, "flagged": 0, "cluster_method": "x", "check_counts": {}}
+        md = report.render(s, [], prompts, [{"index": 0, "violations": ["vague"]},
+                                            {"index": 1, "violations": [], "cached": True}], None)
+        self.assertIn("_1 judged this run, 1 from earlier runs._", md)
+        self.assertIn("- _fix it_\n", md)
+        self.assertIn("- _do the thing_ · cached\n", md)
+
+    def test_judge_packing_line(self):
+        prompts = [{"text": "fix it", "model": "m"}]
+        packing = {"sent": 4, "tokens": 9000, "dropped": 1, "truncated": 2, "truncated_tokens": 12500}
+        s = report.summarize(prompts, {}, [], "x", judge_packing=packing)
+        md = report.render(s, [], prompts, [], None)
+        self.assertIn("_Judge prompt: ~9,000 tokens; 2 of 4 prompts truncated (~12,500 tokens cut), "
+                      "1 left out over budget._", md)
+        s = report.summarize(prompts, {}, [], "x", judge_packing={**packing, "dropped": 0, "truncated": 0})
+        self.assertNotIn("Judge prompt", report.render(s, [], prompts, [], None))
+
     def test_render_rejects_negative_index(self):
         prompts = [{"text": "fix it", "model": "m"}]
         s = {"prompts": 1, "flagged": 0, "cluster_method": "x", "check_counts": {}}
@@ -1,7 +1,8 @@
-import sys, unittest
+import os, sys, tempfile, unittest
+import unittest.mock
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
-import rules
+import rubric, rules
 
 class FakeFile:
     def __init__(self, meta): self.meta = meta
@@ -27,5 +28,88 @@ class TestRules(unittest.TestCase):
         self.assertIn("banned_words", kinds)
         self.assertIn("max_words", kinds)
 
+class TestBundles(unittest.TestCase):
+    def _files(self, d, banned):
+        p = Path(d) / "crit.md"
+        p.write_text(f"---\nkind: deterministic\nbanned_words: [{banned}]\n---\n", encoding="utf-8")
+        return rubric.load_dir(Path(d))
+
+    def test_bundle_matches_apply_to_prompt(self):
+        files = [FakeFile({"banned_words": ["corpus"], "enable": ["banned_words"]})]
+        params, enabled = rules.merge_params(files)
+        bundle = rules.compile_bundle(files)
+        text = "I thought the corpus was fine, fix it"
+        self.assertEqual(sorted(f["check"] for f in bundle.apply(text)),
+                         sorted(f["check"] for f in rules.apply_to_prompt(text, params, enabled)))
+        self.assertEqual(bundle.signature, rules.signature(params, enabled))
+
+    def test_bundle_cached_per_model_until_rubric_changes(self):
+        with tempfile.TemporaryDirectory() as d:
+            files = self._files(d, "corpus")
+            a = rules.bundle_for_model("m", files)
+            self.assertIs(rules.bundle_for_model("m", files), a)
+            self.assertIsNot(rules.bundle_for_model("other", files), a)
+            files = self._files(d, "chain")
+            os.utime(files[0].path, ns=(1, 1))
+            self.assertEqual(rules.bundle_for_model("m", files).params["banned_words"], ["chain"])
+
+    def test_bundles_persist_across_runs(self):
+        with tempfile.TemporaryDirectory() as d:
+            files = self._files(d, "corpus")
+            key, path = rules.rubric_key(files), Path(d) / "rule-bundles.json"
+            built = rules.bundle_for_model("m", files, key)
+            rules.bundle_for_model(None, files, key)
+            rules.save_bundles(key, path)
+            with unittest.mock.patch.dict(rules._BUNDLES, clear=True), \
+                 unittest.mock.patch.object(rubric, "resolve_for_model") as resolve:
+                self.assertEqual(rules.load_bundles(key, path), 2)
+                again = rules.bundle_for_model("m", files, key)
+                rules.bundle_for_model(None, files, key)
+                resolve.assert_not_called()
+            self.assertEqual((again.signature, again.checks), (built.signature, built.checks))
+            self.assertTrue(again.apply("the corpus is big"))
+            os.utime(files[0].path, ns=(1, 1))
+            with unittest.mock.patch.dict(rules._BUNDLES, clear=True):
+                self.assertEqual(rules.load_bundles(rules.rubric_key(files), path), 0)
+
+class TestBatch(unittest.TestCase):
+    TEXTS = ["I thought the corpus was fine", "fix it like I said", "use a doc instead of a file",
+             "plain", "", "CORPUS\0 with a nul, fix this", "please do that thing",
+             "like İ said, Fix İt"]
+
+    def test_batch_matches_per_prompt(self):
+        files = [FakeFile({"banned_words": ["corpus"], "max_words": 4,
+                           "regex_polite": r"\bplease\b"})]
+        bundle = rules.compile_bundle(files)
+        self.assertEqual(rules.apply_batch(self.TEXTS, bundle), [bundle.apply(t) for t in self.TEXTS])
+        self.assertTrue(rules.apply_batch(self.TEXTS, bundle)[-1])    # re.I folds İ; lower() doesn't
+
+    def test_regex_checks_from_frontmatter(self):
+        files = [FakeFile({"regex_polite": r"\bplease\b", "regex_broken": "(", "regex_max_words": "x"})]
+        params, enabled = rules.merge_params(files)
+        self.assertIn("polite", enabled)
+        self.assertNotIn("broken", [n for n, _ in params["_regex"]])    # bad pattern skipped
+        self.assertNotIn("max_words", params.get("regex_checks", {}))   # can't shadow a built-in
+        found = rules.apply_to_prompt("Please run it", params, enabled)
+        self.assertIn({"check": "polite", "evidence": "matched 'Please'"}, found)
+        self.assertEqual(rules.compile_bundle(files).checks[-1][0], "polite")
+
+class TestBannedWords(unittest.TestCase):
+    def test_evidence_keeps_list_order_and_overlaps(self):
+        params = {"banned_words": ["york", "New York", "grain"]}
+        self.assertEqual(rules.check_banned_words("Grain shipped to new york", params),
+                         "banned: york, New York, grain")
+        self.assertIsNone(rules.check_banned_words("yorkshire grains", params))
+
+    def test_merge_params_compiles_once(self):
+        files = [FakeFile({"banned_words": ["corpus", "chain"]})]
+        params, _ = rules.merge_params(files)
+        self.assertIs(params["_banned"], rules.merge_params(files)[0]["_banned"])
+        with unittest.mock.patch.object(rules, "compile_banned") as comp:
+            self.assertEqual(rules.check_banned_words("a chain of corpus", params), "banned: corpus, chain")
+        comp.assert_not_called()
+        self.assertEqual(rules.signature(params, {"banned_words"}),
+                         rules.signature({"banned_words": ["corpus", "chain"]}, {"banned_words"}))
+
 if __name__ == "__main__":
     unittest.main()
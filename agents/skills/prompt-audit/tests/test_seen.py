@@ -0,0 +1,58 @@
+import os, sys, tempfile, unittest
+from unittest import mock
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import seen
+
+class TestSeen(unittest.TestCase):
+    def test_key_ignores_whitespace_only(self):
+        self.assertEqual(seen.key("run  the\ntests "), seen.key("run the tests"))
+        self.assertNotEqual(seen.key("run the tests"), seen.key("Run the tests"))
+
+    def test_expand_clusters_weights_by_count(self):
+        cs = seen.expand_clusters([{"members": [0, 2], "representative": 0, "size": 2}], [3, 1, 2])
+        self.assertEqual(cs[0]["size"], 5)
+
+    def test_record_and_reuse(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.environ["XDG_STATE_HOME"] = d
+            try:
+                keys = [seen.key("fix it"), seen.key("go")]
+                store = seen.record(seen.load(), keys, ["t1", "t2"], [2, 1],
+                                    {0: [{"check": "ambiguous_referent"}]}, ["sig", "sig"])
+                seen.save(store)
+                self.assertNotIn("\n", seen.seen_path().read_text())
+                again = seen.load()
+                self.assertEqual(again[keys[0]], {"count": 2, "last": "t1",
+                                                  "findings": {"sig": [{"check": "ambiguous_referent"}]}})
+                self.assertEqual(seen.cached_findings(again[keys[0]], "sig"), [{"check": "ambiguous_referent"}])
+                self.assertEqual(seen.cached_findings(again[keys[1]], "sig"), [])
+                self.assertIsNone(seen.cached_findings(again[keys[0]], "other"))
+            finally:
+                del os.environ["XDG_STATE_HOME"]
+
+    def test_record_keeps_findings_per_signature(self):
+        k = seen.key("run the tests")
+        store = seen.record({}, [k, k], ["t1", "t2"], [1, 1], {1: [{"check": "banned_words"}]}, ["a", "b"])
+        self.assertEqual(store[k]["count"], 2)
+        self.assertEqual(seen.cached_findings(store[k], "a"), [])
+        store = seen.record(store, [k], ["t3"], [1], {}, ["a"])
+        self.assertEqual(seen.cached_findings(store[k], "b"), [{"check": "banned_words"}])
+        with mock.patch.object(seen, "MAX_SIGNATURES", 2):
+            store = seen.record(store, [k], ["t4"], [1], {}, ["c"])
+        self.assertEqual(list(store[k]["findings"]), ["a", "c"])   # least recently used dropped
+
+    def test_is_new_skips_occurrences_already_counted(self):
+        entry = {"count": 3, "last": "2026-08-09T10:00:00Z"}
+        self.assertTrue(seen.is_new(None, "2026-08-01T00:00:00Z"))
+        self.assertFalse(seen.is_new(entry, "2026-08-09T10:00:00Z"))
+        self.assertTrue(seen.is_new(entry, "2026-08-10T00:00:00Z"))
+
+    def test_save_keeps_most_recent(self):
+        with tempfile.TemporaryDirectory() as d, mock.patch.object(seen, "MAX_SEEN", 2):
+            path = Path(d) / "seen.json"
+            seen.save({"a": {"last": "t1"}, "b": {"last": "t3"}, "c": {"last": "t2"}}, path)
+            self.assertEqual(sorted(seen.load(path)), ["b", "c"])
+
+if __name__ == "__main__":
+    unittest.main()
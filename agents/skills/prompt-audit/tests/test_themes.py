@@ -0,0 +1,82 @@
+import sys, tempfile, unittest
+from unittest import mock
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+import cluster, seen, themes
+
+def _run(store, vecs, texts, weights=None, label="2026-08-01"):
+    unit = [cluster.normalize(v) for v in vecs]
+    clusters = cluster.greedy_cluster(unit, threshold=0.9, seeds=store.seeds())
+    store.absorb(clusters, unit, texts, weights or [1] * len(texts), label=label)
+    return clusters
+
+class TestThemeStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "themes.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_new_run_joins_existing_themes(self):
+        store = themes.ThemeStore(self.path)
+        first = _run(store, [[1.0, 0.0], [0.0, 1.0]], ["fix the build", "write docs"], [3, 1])
+        self.assertTrue(all(c["new_theme"] for c in first))
+        store.save()
+
+        store = themes.ThemeStore(self.path)
+        second = _run(store, [[0.99, 0.05], [-1.0, 0.0]], ["fix the build again", "deploy"],
+                      label="2026-08-02")
+        joined, opened = second
+        self.assertEqual((joined["theme"], joined["total"], joined["new_theme"]), ("t1", 4, False))
+        self.assertEqual((opened["theme"], opened["new_theme"]), ("t3", True))
+        self.assertEqual(store.themes["t1"]["history"], [["2026-08-01", 3], ["2026-08-02", 1]])
+        self.assertEqual(store.themes["t1"]["representative"], "fix the build")
+        # The centroid moved towards the new prompt, weighted by size.
+        c = themes._decode(store.themes["t1"]["centroid"])
+        self.assertGreater(c[1], 0.0)
+        self.assertLess(c[1], 0.05)
+
+    def test_counted_occurrences_add_nothing(self):
+        store = themes.ThemeStore(self.path)
+        _run(store, [[1.0, 0.0]], ["fix the build"], [2])
+        again = _run(store, [[1.0, 0.0], [0.0, 1.0]], ["fix the build", "write docs"], [0, 0])
+        self.assertEqual((again[0]["theme"], again[0]["added"], again[0]["total"]), ("t1", 0, 2))
+        self.assertNotIn("theme", again[1])
+        self.assertEqual((list(store.themes), store.themes["t1"]["size"]), (["t1"], 2))
+
+    def test_growth_rows(self):
+        store = themes.ThemeStore(self.path)
+        clusters = seen.expand_clusters(_run(store, [[1.0, 0.0], [0.0, 1.0]], ["a", "b"], [5, 2]), [5, 2])
+        rows = store.growth(clusters)
+        self.assertEqual([(r["theme"], r["added"], r["total"], r["history"]) for r in rows],
+                         [("t1", 5, 5, [5]), ("t2", 2, 2, [2])])
+
+    def test_recompact_merges_drifted_themes(self):
+        store = themes.ThemeStore(self.path)
+        _run(store, [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]], ["a", "b", "c"], [1, 5, 2])
+        self.assertEqual(len(store.themes), 3)
+        self.assertEqual(store.recompact(threshold=0.75), 1)
+        self.assertEqual(list(store.themes), ["t1", "t2"])
+        self.assertEqual(store.themes["t2"]["size"], 7)
+        self.assertEqual(store.themes["t2"]["representative"], "b")
+        self.assertEqual(store.recompact(threshold=0.75), 0)
+
+    def test_save_drops_themes_that_stopped_growing(self):
+        store = themes.ThemeStore(self.path)
+        _run(store, [[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]], ["a", "b", "c"], [5, 1, 2])
+        _run(store, [[0.0, 1.0], [0.0, -1.0]], ["b again", "d"], [1, 1], label="2026-08-02")
+        with mock.patch.object(themes, "MAX_THEMES", 3):
+            store.save()
+        # t1 and t3 last grew on the first run; t3 is the smaller.
+        self.assertEqual(list(themes.ThemeStore(self.path).themes), ["t1", "t2", "t4"])
+
+    def test_other_model_starts_fresh(self):
+        store = themes.ThemeStore(self.path, model="a")
+        _run(store, [[1.0, 0.0]], ["x"])
+        store.save()
+        self.assertEqual(len(themes.ThemeStore(self.path, model="a").themes), 1)
+        self.assertEqual(themes.ThemeStore(self.path, model="b").themes, {})
+
+if __name__ == "__main__":
+    unittest.main()